@@ -1,15 +1,82 @@
+import asyncio
+import hashlib
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Optional
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from config import settings
 from db import get_db
+from cache import TTLCache, user_cache
 import repository as repository_users
 
 
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+        Runs bcrypt hashing and verification on a bounded worker pool, off the event loop.
+
+        At most ``workers`` hashes run at once and at most ``queue_size`` more wait for a worker.
+        Calls beyond that are rejected immediately with 503 so a login burst cannot pile up
+        unbounded work or stall other requests.
+
+        Attributes:
+            workers (int): Number of pool workers.
+            queue_size (int): Number of calls allowed to wait for a free worker.
+            use_processes (bool): Use a process pool instead of a thread pool.
+            pending (int): Calls currently running or waiting.
+        """
+
+    def __init__(self, workers: int, queue_size: int, use_processes: bool = False):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.use_processes = use_processes
+        self.pending = 0
+        self._executor: Executor | None = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            pool_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._executor = pool_class(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, func, *args):
+        """
+                Runs ``func(*args)`` on the pool.
+
+                Raises:
+                    HTTPException: 503 if the pool and its queue are full.
+                """
+        if self.pending >= self.workers + self.queue_size:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Server is busy, try again later", headers={"Retry-After": "1"})
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
 class Auth:
     """
        Class responsible for handling authentication related functionalities such as password hashing,
@@ -17,16 +84,21 @@ class Auth:
 
        Attributes:
            pwd_context (CryptContext): Password hashing context.
+           password_hasher (PasswordHasher): Bounded pool that runs the bcrypt work.
+           token_cache (TTLCache): Verified token claims keyed on the token hash, kept until the token expires.
            SECRET_KEY (str): Secret key used for token encryption.
            ALGORITHM (str): Encryption algorithm used for token encryption.
            oauth2_scheme (OAuth2PasswordBearer): OAuth2 password bearer for token retrieval.
        """
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = pwd_context
+    password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_queue_size,
+                                     settings.password_hash_processes)
+    token_cache = TTLCache(settings.token_cache_size, ttl=0)
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-    def verify_password(self, plain_password, hashed_password):
+    async def verify_password(self, plain_password, hashed_password):
         """
                Verifies if the provided plain password matches the hashed password.
 
@@ -36,10 +108,13 @@ class Auth:
 
                Returns:
                    bool: True if the passwords match, False otherwise.
+
+               Raises:
+                   HTTPException: 503 if the hashing pool is saturated.
                """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return await self.password_hasher.run(_verify_password, plain_password, hashed_password)
 
-    def get_password_hash(self, password: str):
+    async def get_password_hash(self, password: str):
         """
         Hashes the provided password.
 
@@ -48,9 +123,37 @@ class Auth:
 
         Returns:
             str: The hashed password.
+
+        Raises:
+            HTTPException: 503 if the hashing pool is saturated.
         """
 
-        return self.pwd_context.hash(password)
+        return await self.password_hasher.run(_hash_password, password)
+
+    def decode_token(self, token: str) -> dict:
+        """
+        Verifies the token signature and returns its claims, reusing earlier verifications.
+
+        Verified claims are cached under a SHA-256 of the token until the token's ``exp``, so a
+        token presented many times is only checked once. Invalid tokens are never cached.
+
+        Args:
+            token (str): Encoded JWT.
+
+        Returns:
+            dict: The token claims.
+
+        Raises:
+            JWTError: If the token is invalid or expired.
+        """
+        key = hashlib.sha256(token.encode()).digest()
+        payload = self.token_cache.get(key)
+        if payload is None:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            ttl = payload.get("exp", 0) - time.time()
+            if ttl > 0:
+                self.token_cache.set(key, payload, ttl=ttl)
+        return payload
 
     async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
         """
@@ -109,7 +212,7 @@ class Auth:
         """
 
         try:
-            payload = jwt.decode(refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_token(refresh_token)
             if payload['scope'] == "refresh_token":
                 email = payload['sub']
                 return email
@@ -117,13 +220,16 @@ class Auth:
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
         """
                Retrieves the current user based on the provided token.
 
+               The user is served from ``cache.user_cache`` when possible, so most authenticated
+               requests skip the database lookup. The returned object is a detached copy.
+
                Args:
                    token (str): Access token for authentication.
-                   db (Session): Database session.
+                   db (AsyncSession): Database session.
 
                Returns:
                    User: Current authenticated user.
@@ -137,7 +243,7 @@ class Auth:
             headers={"WWW-Authenticate": "Bearer"},
         )
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_token(token)
             if payload["scope"] == "access_token":
                 email = payload["sub"]
                 if email is None:
@@ -147,10 +253,13 @@ class Auth:
         except JWTError as e:
             raise credentials_exception
 
+        user = await user_cache.get(email)
+        if user is not None:
+            return user
         user = await repository_users.get_user_by_email(email, db)
         if user is None:
             raise credentials_exception
-        return user
+        return await user_cache.set(user)
 
     def create_email_token(self, data: dict):
         """
@@ -182,7 +291,7 @@ class Auth:
                     HTTPException: If the token is invalid.
                 """
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_token(token)
             email = payload["sub"]
             return email
         except JWTError as e:
@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import io
+import re
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+
+import cloudinary
+import cloudinary.uploader
+from PIL import Image, ImageOps
+
+from config import settings
+
+AVATAR_FORMAT = "JPEG"
+AVATAR_CONTENT_TYPE = "image/jpeg"
+
+
+@lru_cache(maxsize=4096)
+def gravatar_url(email: str) -> str:
+    """
+    Returns the Gravatar image URL of ``email``: the MD5 of the trimmed, lower-cased address.
+
+    Computed locally without any network access.
+
+    Args:
+        email (str): Email address.
+
+    Returns:
+        str: The Gravatar URL.
+    """
+    digest = hashlib.md5(email.strip().lower().encode(), usedforsecurity=False).hexdigest()
+    return f"https://www.gravatar.com/avatar/{digest}"
+
+
+def check_image(path: str) -> None:
+    """
+    Checks that ``path`` holds an image Pillow can read, looking at the header only.
+
+    Raises:
+        PIL.UnidentifiedImageError: If the file is not a supported image.
+        PIL.Image.DecompressionBombError: If the image is unreasonably large.
+    """
+    with Image.open(path) as image:
+        image.verify()
+
+
+def resize_avatar(path: str, size: int = 250, quality: int = 85) -> bytes:
+    """
+    Crops an uploaded image to a centred square, scales it to ``size`` x ``size`` and re-encodes it.
+
+    JPEG files are decoded at a reduced scale where possible, so large photos are cheap to
+    shrink. The EXIF orientation is applied and metadata is dropped.
+
+    Args:
+        path (str): Path of the uploaded image.
+        size (int): Width and height of the avatar in pixels.
+        quality (int): JPEG quality of the result.
+
+    Returns:
+        bytes: The encoded avatar.
+    """
+    with Image.open(path) as image:
+        image.draft("RGB", (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        avatar = ImageOps.fit(image, (size, size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    avatar.save(buffer, AVATAR_FORMAT, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+class AvatarStorage(ABC):
+    """
+        Where processed avatars are stored. Subclasses implement :meth:`save`.
+        """
+
+    @abstractmethod
+    async def save(self, key: str, data: bytes) -> str:
+        """
+                Stores the encoded avatar ``data`` under ``key`` and returns its public URL.
+                """
+
+
+class LocalAvatarStorage(AvatarStorage):
+    """
+        Stores avatars as files under ``root``, served from ``base_url``.
+
+        Attributes:
+            root (Path): Directory holding the files.
+            base_url (str): URL prefix the directory is served at.
+        """
+
+    def __init__(self, root: str, base_url: str):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def path_for(self, key: str) -> Path:
+        name = "/".join(re.sub(r"[^\w.-]", "_", part).lstrip(".") or "_" for part in key.split("/"))
+        return self.root / f"{name}.jpg"
+
+    def _write(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+    async def save(self, key: str, data: bytes) -> str:
+        path = self.path_for(key)
+        await asyncio.to_thread(self._write, path, data)
+        return f"{self.base_url}/{path.relative_to(self.root).as_posix()}?v={int(time.time())}"
+
+
+class CloudinaryAvatarStorage(AvatarStorage):
+    """
+        Uploads avatars to Cloudinary; the account is configured once, when the storage is created.
+        """
+
+    def __init__(self, cloud_name: str, api_key: str, api_secret: str):
+        cloudinary.config(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True)
+
+    async def save(self, key: str, data: bytes) -> str:
+        r = await asyncio.to_thread(cloudinary.uploader.upload, io.BytesIO(data), public_id=key, overwrite=True)
+        return cloudinary.CloudinaryImage(key).build_url(version=r.get('version'))
+
+
+def build_avatar_storage() -> AvatarStorage:
+    """
+    Creates the storage selected by ``settings.avatar_storage`` ("cloudinary" or "local").
+    """
+    if settings.avatar_storage == "local":
+        return LocalAvatarStorage(settings.avatar_dir, settings.avatar_base_url)
+    return CloudinaryAvatarStorage(settings.cloudinary_name, settings.cloudinary_api_key,
+                                   settings.cloudinary_api_secret)
+
+
+avatar_storage = build_avatar_storage()
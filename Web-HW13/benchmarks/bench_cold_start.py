@@ -0,0 +1,44 @@
+"""
+Measures worker cold-start time: how long a fresh interpreter takes to import the application.
+
+Each sample spawns a new Python process that imports ``--module`` (``main`` by default) and
+reports the elapsed time, so module-level side effects such as engine creation or schema setup
+are included. Run it on two checkouts to compare before and after a change::
+
+    python benchmarks/bench_cold_start.py --runs 20
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parents[1]
+
+SNIPPET = "import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+
+
+def sample(module: str) -> float:
+    """
+    Imports ``module`` in a fresh interpreter and returns the import time in seconds.
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(module=module)],
+        cwd=PROJECT_DIR, check=True, capture_output=True, text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    samples = [sample(args.module) * 1000 for _ in range(args.runs)]
+    print(f"import {args.module}: median {statistics.median(samples):.1f} ms, "
+          f"min {min(samples):.1f} ms, max {max(samples):.1f} ms over {args.runs} runs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Throughput benchmark of the pooled email dispatcher against one SMTP connection per message.
+
+Starts a local aiosmtpd server that accepts and discards mail, then sends ``--messages``
+verification-sized emails twice: the old way (connect, send, quit for every message, as
+``FastMail.send_message`` does) and through :class:`my_email.EmailDispatcher`. Reports
+messages per second and SMTP connections opened.
+
+Usage:
+    python benchmarks/bench_email.py --messages 2000 --pool-size 4
+"""
+import argparse
+import asyncio
+import socket
+import sys
+import time
+from email.message import EmailMessage
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import aiosmtplib  # noqa: E402
+from aiosmtpd.controller import Controller  # noqa: E402
+
+from my_email import EmailDispatcher  # noqa: E402
+
+
+class Sink:
+    async def handle_DATA(self, server, session, envelope):
+        return "250 OK"
+
+
+def make_message(number: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "app@example.com"
+    message["To"] = f"user{number}@example.com"
+    message["Subject"] = "Confirm your email"
+    message.set_content("<p>Hi, please confirm your email.</p>" * 20, subtype="html")
+    return message
+
+
+async def per_message(options: dict, messages: list, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(message):
+        async with semaphore:
+            await aiosmtplib.send(message, **options)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(message) for message in messages))
+    return time.perf_counter() - start
+
+
+async def pooled(options: dict, messages: list, pool_size: int, batch_size: int) -> tuple:
+    dispatcher = EmailDispatcher(options, pool_size=pool_size, batch_size=batch_size, queue_size=len(messages))
+    start = time.perf_counter()
+    for message in messages:
+        await dispatcher.send(message)
+    await dispatcher.stop(timeout=600)
+    return time.perf_counter() - start, dispatcher.connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    controller = Controller(Sink(), hostname="127.0.0.1", port=port)
+    controller.start()
+    options = {"hostname": "127.0.0.1", "port": port}
+    messages = [make_message(number) for number in range(args.messages)]
+    try:
+        single = asyncio.run(per_message(options, messages, args.pool_size))
+        elapsed, connections = asyncio.run(pooled(options, messages, args.pool_size, args.batch_size))
+    finally:
+        controller.stop()
+
+    print(f"connection per message: {args.messages / single:8.0f} msg/s ({args.messages} connections)")
+    print(f"pooled dispatcher:      {args.messages / elapsed:8.0f} msg/s ({connections} connections)")
+
+
+if __name__ == "__main__":
+    main()
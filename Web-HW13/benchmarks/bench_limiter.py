@@ -0,0 +1,64 @@
+"""
+Per-request overhead of the rate limiter dependency.
+
+Calls :class:`limiter.RateLimiter` ``--requests`` times for requests spread over ``--users``
+authenticated users, with limits high enough that nothing is rejected, and reports the mean
+cost per check for the local token bucket alone and for local plus the global Redis bucket.
+Without ``BENCH_REDIS_URL`` the Redis case runs against an in-memory fake, which measures the
+client and script overhead but not the network round-trip.
+
+Usage:
+    BENCH_REDIS_URL=redis://localhost:6379/0 python benchmarks/bench_limiter.py --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import redis.asyncio as redis  # noqa: E402
+from fakeredis import FakeAsyncRedis  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from auth import auth_service  # noqa: E402
+from limiter import RateLimiter  # noqa: E402
+
+
+async def measure(limiter: RateLimiter, requests: list) -> float:
+    """
+    Returns the mean wall time per check in microseconds.
+    """
+    start = time.perf_counter()
+    for request in requests:
+        await limiter(request)
+    return (time.perf_counter() - start) / len(requests) * 1_000_000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    tokens = [await auth_service.create_access_token(data={"sub": f"user{number}@example.com"})
+              for number in range(args.users)]
+    requests = [
+        Request({"type": "http", "method": "POST", "path": "/api/contacts/", "client": ("10.0.0.1", 1234),
+                 "headers": [(b"authorization", f"Bearer {tokens[number % args.users]}".encode())]})
+        for number in range(args.requests)
+    ]
+    url = os.environ.get("BENCH_REDIS_URL")
+    client = redis.Redis.from_url(url) if url else FakeAsyncRedis()
+
+    limit = args.requests
+    local = await measure(RateLimiter(limit, 60, name="bench"), requests)
+    shared = await measure(RateLimiter(limit, 60, name="bench", redis_client=client), requests)
+    print(f"local bucket:          {local:8.1f} us/request")
+    print(f"local + Redis bucket:  {shared:8.1f} us/request ({'redis' if url else 'fakeredis'})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Login-storm benchmark: latency of GET /api/contacts/ while a burst of logins is hashing passwords.
+
+Runs the application in-process over an ASGI transport on a single event loop, like one uvicorn
+worker, against a throwaway SQLite database. A steady probe requests the contact list while
+``--logins`` concurrent logins run. With bcrypt executed inline every login holds the loop for
+a few hundred milliseconds and the probe's p99 grows with the storm; with the bounded hashing
+pool it stays close to the idle baseline, and logins beyond the queue get a fast 503.
+
+Usage:
+    python benchmarks/bench_login_storm.py --logins 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+
+import httpx  # noqa: E402
+
+from auth import auth_service  # noqa: E402
+from db import SessionLocal, engine  # noqa: E402
+from main import app  # noqa: E402
+from models import Base, User  # noqa: E402
+
+EMAIL = "storm@example.com"
+PASSWORD = "storm-password"
+
+
+async def seed() -> str:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as db:
+        db.add(User(username="storm", email=EMAIL, password=auth_service.pwd_context.hash(PASSWORD),
+                    confirmed=True))
+        await db.commit()
+    return await auth_service.create_access_token(data={"sub": EMAIL})
+
+
+async def probe(client: httpx.AsyncClient, token: str, stop: asyncio.Event) -> list:
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/api/contacts/", headers={"Authorization": f"Bearer {token}"})
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.005)
+    return samples
+
+
+def percentile(samples: list, q: float) -> float:
+    return statistics.quantiles(samples, n=100)[int(q) - 1] if len(samples) > 1 else samples[0]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=50)
+    args = parser.parse_args()
+
+    token = await seed()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        stop = asyncio.Event()
+        idle = asyncio.create_task(probe(client, token, stop))
+        await asyncio.sleep(1)
+        stop.set()
+        idle_samples = await idle
+
+        stop = asyncio.Event()
+        storm_probe = asyncio.create_task(probe(client, token, stop))
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post("/api/auth/login", data={"username": EMAIL, "password": PASSWORD})
+            for _ in range(args.logins)
+        ))
+        storm_seconds = time.perf_counter() - start
+        stop.set()
+        storm_samples = await storm_probe
+
+    codes = Counter(response.status_code for response in responses)
+    print(f"logins: {args.logins} in {storm_seconds:.2f}s, status codes {dict(codes)}")
+    print(f"/contacts idle:  p50 {percentile(idle_samples, 50):7.1f} ms  p99 {percentile(idle_samples, 99):7.1f} ms")
+    print(f"/contacts storm: p50 {percentile(storm_samples, 50):7.1f} ms  p99 {percentile(storm_samples, 99):7.1f} ms")
+    auth_service.password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+Signup latency benchmark: POST /api/auth/signup against its two unavoidable costs.
+
+Runs the application in-process over an ASGI transport against a throwaway SQLite database and
+signs up ``--users`` new users one after another. Verification-email jobs go to an in-memory
+fake Redis so only the API side is measured. The median signup is compared with the median
+bcrypt hash and the median bare ``INSERT`` of a user row; what is left is HTTP, validation and
+the enqueue, with no Gravatar or other network work on the path.
+
+Usage:
+    python benchmarks/bench_signup.py --users 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+
+import httpx  # noqa: E402
+from fakeredis import FakeAsyncRedis  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from auth import auth_service  # noqa: E402
+from db import SessionLocal, engine  # noqa: E402
+from jobs import job_queue  # noqa: E402
+from main import app  # noqa: E402
+from models import Base, User  # noqa: E402
+
+PASSWORD = "signup-password"
+
+
+async def timed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return (time.perf_counter() - start) * 1000
+
+
+async def insert_user(number: int, password: str):
+    async with SessionLocal() as db:
+        await db.execute(insert(User).values(username=f"raw{number}", email=f"raw{number}@example.com",
+                                             password=password))
+        await db.commit()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    job_queue.redis = FakeAsyncRedis()
+    password_hash = await auth_service.get_password_hash(PASSWORD)
+
+    hashing = [await timed(auth_service.get_password_hash(PASSWORD)) for _ in range(args.users)]
+    inserts = [await timed(insert_user(number, password_hash)) for number in range(args.users)]
+    signups = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for number in range(args.users):
+            body = {"username": f"user{number}", "email": f"user{number}@example.com", "password": PASSWORD}
+            start = time.perf_counter()
+            response = await client.post("/api/auth/signup", json=body)
+            signups.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 201, response.text
+
+    signup, bcrypt, row = (statistics.median(samples) for samples in (signups, hashing, inserts))
+    print(f"signup median:  {signup:7.2f} ms (p99 {statistics.quantiles(signups, n=100)[98]:.2f} ms)")
+    print(f"bcrypt median:  {bcrypt:7.2f} ms")
+    print(f"INSERT median:  {row:7.2f} ms")
+    print(f"everything else: {signup - bcrypt - row:6.2f} ms")
+    auth_service.password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
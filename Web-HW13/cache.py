@@ -0,0 +1,325 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, NamedTuple, Optional
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from config import settings
+from models import User
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """
+        In-process LRU cache whose entries expire after a time to live.
+
+        Attributes:
+            maxsize (int): Maximum number of entries; the least recently used entry is evicted first.
+            ttl (float): Default time to live of an entry in seconds.
+            hits (int): Number of lookups answered from the cache.
+            misses (int): Number of lookups that found nothing or an expired entry.
+        """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key) -> Optional[Any]:
+        """
+                Returns the cached value for ``key`` or None if it is missing or expired.
+                """
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, ttl: Optional[float] = None) -> None:
+        """
+                Stores ``value`` under ``key`` for ``ttl`` seconds (default: the cache's ttl).
+                """
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class UserCache:
+    """
+        Two-tier cache of authenticated users keyed on email (the token's ``sub``).
+
+        Lookups go to the in-process LRU first, then to Redis when a client is configured. Cached
+        users are transient copies detached from any session and carry neither the password hash
+        nor the refresh token. Writes to a user must call :meth:`invalidate`, which also publishes
+        the email on :attr:`CHANNEL` of ``bus``; processes running :meth:`listen` drop their
+        in-process copy when they receive it, so writes from other processes (such as the job
+        worker) are seen without waiting for ``ttl``.
+
+        Attributes:
+            local (TTLCache): In-process tier.
+            redis (redis.asyncio.Redis | None): Optional shared tier.
+            ttl (int): Time to live of an entry in seconds.
+            bus (redis.asyncio.Redis | None): Client that invalidations are published and received on.
+        """
+    FIELDS = ("id", "username", "email", "created_at", "avatar", "confirmed", "version")
+    CHANNEL = "user-cache:invalidate"
+
+    def __init__(self, local: TTLCache, redis_client: Optional[redis.Redis] = None, ttl: int = 60,
+                 bus: Optional[redis.Redis] = None):
+        self.local = local
+        self.redis = redis_client
+        self.ttl = ttl
+        self.bus = bus
+
+    @staticmethod
+    def _key(email: str) -> str:
+        return f"user:{email}"
+
+    @classmethod
+    def _dump(cls, user: User) -> dict:
+        return {field: getattr(user, field) for field in cls.FIELDS}
+
+    @staticmethod
+    def _encode(data: dict) -> str:
+        return json.dumps(data, default=lambda value: value.isoformat())
+
+    @staticmethod
+    def _decode(raw: bytes | str) -> dict:
+        data = json.loads(raw)
+        if data.get("created_at"):
+            data["created_at"] = datetime.fromisoformat(data["created_at"])
+        return data
+
+    async def get(self, email: str) -> Optional[User]:
+        """
+                Returns a cached copy of the user with ``email`` or None on a miss.
+                """
+        user = self.local.get(email)
+        if user is not None or self.redis is None:
+            return user
+        try:
+            raw = await self.redis.get(self._key(email))
+        except RedisError:
+            return None
+        if raw is None:
+            return None
+        user = User(**self._decode(raw))
+        self.local.set(email, user)
+        return user
+
+    async def set(self, user: User) -> User:
+        """
+                Caches a detached copy of ``user`` and returns it.
+                """
+        data = self._dump(user)
+        copy = User(**data)
+        self.local.set(user.email, copy)
+        if self.redis is not None:
+            try:
+                await self.redis.set(self._key(user.email), self._encode(data), ex=self.ttl)
+            except RedisError:
+                pass
+        return copy
+
+    async def invalidate(self, email: str) -> None:
+        """
+                Drops the user with ``email`` from both tiers and tells the other processes to drop it.
+                """
+        self.local.delete(email)
+        if self.redis is not None:
+            try:
+                await self.redis.delete(self._key(email))
+            except RedisError:
+                pass
+        if self.bus is not None:
+            try:
+                await self.bus.publish(self.CHANNEL, email)
+            except (RedisError, OSError) as err:
+                logger.warning("Could not publish user cache invalidation for %s: %r", email, err)
+
+    async def listen(self, retry_delay: float = 1) -> None:
+        """
+                Drops local copies of the users invalidated by any process, until cancelled.
+
+                While the subscription is down invalidations may be missed, so the in-process tier
+                is cleared every time it is (re)established.
+                """
+        while True:
+            try:
+                async with self.bus.pubsub() as pubsub:
+                    await pubsub.subscribe(self.CHANNEL)
+                    self.local.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            data = message["data"]
+                            self.local.delete(data.decode() if isinstance(data, bytes) else data)
+            except (RedisError, OSError) as err:
+                logger.warning("User cache invalidation channel failed, retrying: %r", err)
+                await asyncio.sleep(retry_delay)
+
+
+class CachedResponse(NamedTuple):
+    """
+        A serialized response body with the headers that go with it.
+        """
+    body: bytes
+    headers: dict
+
+
+class ContactCache:
+    """
+        Read-through cache of serialized contact responses, per user and page.
+
+        Entries live in Redis with a local LRU in front. Their keys include the user's current
+        version, a random token stored in Redis that every contact write replaces through
+        :meth:`bump`; entries of older versions are never read again and expire after ``ttl``.
+        Invalidation is therefore one ``SET`` whatever the number of cached pages. Versions expire
+        after ``ttl`` as well, so a bump lost to a Redis failure goes stale for at most ``ttl``.
+        Without a reachable Redis the cache is bypassed, since the version cannot be checked.
+
+        Attributes:
+            local (TTLCache): In-process tier keyed on user, version and page.
+            redis (redis.asyncio.Redis): Shared tier that also holds the versions.
+            ttl (int): Time to live of an entry in seconds.
+            redis_hits (int): Lookups answered by Redis.
+            misses (int): Lookups answered by neither tier.
+        """
+
+    def __init__(self, local: TTLCache, redis_client: redis.Redis, ttl: int = 300):
+        self.local = local
+        self.redis = redis_client
+        self.ttl = ttl
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _version_key(user_id: int) -> str:
+        return f"contacts:{user_id}:version"
+
+    @staticmethod
+    def _encode(response: CachedResponse) -> bytes:
+        return json.dumps(response.headers).encode() + b"\n" + response.body
+
+    @staticmethod
+    def _decode(raw: bytes) -> CachedResponse:
+        headers, _, body = raw.partition(b"\n")
+        return CachedResponse(body, json.loads(headers))
+
+    async def version(self, user_id: int) -> Optional[str]:
+        """
+                Returns the user's current contacts version, or None if Redis is unreachable.
+                """
+        key = self._version_key(user_id)
+        try:
+            version = await self.redis.get(key)
+            if version is None:
+                await self.redis.set(key, uuid.uuid4().hex, nx=True, ex=self.ttl)
+                version = await self.redis.get(key)
+        except (RedisError, OSError):
+            return None
+        return version.decode() if isinstance(version, bytes) else version
+
+    async def bump(self, user_id: int, attempts: int = 2) -> None:
+        """
+                Invalidates everything cached for the user's contacts.
+
+                A failed ``SET`` is retried; if it keeps failing the version is deleted instead, so
+                the next read starts a new one, and failing that it expires within ``ttl``.
+                """
+        key = self._version_key(user_id)
+        for attempt in range(attempts):
+            try:
+                await self.redis.set(key, uuid.uuid4().hex, ex=self.ttl)
+                return
+            except (RedisError, OSError) as err:
+                logger.warning("Could not bump contacts version of user %s (attempt %d): %r",
+                               user_id, attempt + 1, err)
+        try:
+            await self.redis.delete(key)
+        except (RedisError, OSError) as err:
+            logger.error("Contacts version of user %s is stale for up to %ss: %r", user_id, self.ttl, err)
+
+    async def get(self, user_id: int, version: Optional[str], page: str) -> Optional[CachedResponse]:
+        """
+                Returns the cached ``page`` of the user at ``version`` or None on a miss.
+                """
+        if version is None:
+            return None
+        key = f"contacts:{user_id}:{version}:{page}"
+        response = self.local.get(key)
+        if response is not None:
+            return response
+        try:
+            raw = await self.redis.get(key)
+        except (RedisError, OSError):
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.redis_hits += 1
+        response = self._decode(raw)
+        self.local.set(key, response)
+        return response
+
+    async def set(self, user_id: int, version: Optional[str], page: str, response: CachedResponse) -> None:
+        """
+                Caches ``response`` as ``page`` of the user at ``version``.
+                """
+        if version is None:
+            return
+        key = f"contacts:{user_id}:{version}:{page}"
+        self.local.set(key, response)
+        try:
+            await self.redis.set(key, self._encode(response), ex=self.ttl)
+        except (RedisError, OSError):
+            pass
+
+    def stats(self) -> dict:
+        """
+                Returns the hit and miss counters of both tiers.
+                """
+        return {"local_hits": self.local.hits, "redis_hits": self.redis_hits, "misses": self.misses}
+
+
+# Shared by the job queue and the invalidation channel, whose blocking reads wait on purpose.
+redis_client = redis.Redis(host=settings.redis_host, port=settings.redis_port,
+                           socket_connect_timeout=settings.redis_connect_timeout)
+# Used on the request path, where an unreachable Redis must cost a short timeout rather than the OS one.
+cache_redis_client = redis.Redis(host=settings.redis_host, port=settings.redis_port,
+                                 socket_timeout=settings.redis_cache_timeout,
+                                 socket_connect_timeout=settings.redis_cache_timeout)
+
+user_cache = UserCache(
+    TTLCache(settings.user_cache_size, settings.user_cache_ttl),
+    cache_redis_client if settings.user_cache_redis else None,
+    settings.user_cache_ttl,
+    bus=redis_client,
+)
+
+contact_cache = ContactCache(
+    TTLCache(settings.contact_cache_size, settings.contact_cache_ttl),
+    cache_redis_client,
+    settings.contact_cache_ttl,
+)
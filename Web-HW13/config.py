@@ -1,7 +1,7 @@
-from pydantic import BaseConfig
+from pydantic_settings import BaseSettings
 
 
-class Settings(BaseConfig):
+class Settings(BaseSettings):
     """
         Configuration settings for the application.
 
@@ -16,9 +16,43 @@ class Settings(BaseConfig):
             mail_server (str): SMTP server for sending emails.
             redis_host (str): Hostname of the Redis server (default: 'localhost').
             redis_port (int): Port of the Redis server (default: 6379).
+            redis_connect_timeout (float): Seconds to wait for a connection to Redis (default: 2).
+            redis_cache_timeout (float): Seconds cache and rate limit calls wait for Redis before going without it (default: 0.25).
             cloudinary_name (str): Cloudinary account name.
             cloudinary_api_key (str): Cloudinary API key.
             cloudinary_api_secret (str): Cloudinary API secret.
+            db_pool_size (int): Number of connections kept open per worker (default: 5).
+            db_max_overflow (int): Extra connections allowed above the pool size under load (default: 10).
+            db_pool_timeout (float): Seconds to wait for a free connection before failing (default: 30).
+            db_pool_recycle (int): Seconds after which a connection is replaced (default: 1800).
+            db_pool_pre_ping (bool): Whether to test connections on checkout, dropping stale ones (default: True).
+            password_hash_workers (int): Number of workers hashing passwords (default: 2).
+            password_hash_queue_size (int): Hash calls allowed to wait before returning 503 (default: 32).
+            password_hash_processes (bool): Hash in a process pool instead of threads (default: False).
+            user_cache_ttl (int): Seconds an authenticated user stays cached (default: 60).
+            user_cache_size (int): Maximum number of users cached per worker (default: 10000).
+            user_cache_redis (bool): Share cached users between workers through Redis (default: False).
+            token_cache_size (int): Maximum number of verified tokens cached per worker (default: 10000).
+            import_batch_size (int): Rows inserted per statement by the bulk contact import (default: 1000).
+            email_pool_size (int): Persistent SMTP connections used to send emails (default: 2).
+            email_batch_size (int): Queued emails a connection takes and sends in one go (default: 50).
+            email_queue_size (int): Emails allowed to wait for sending per worker (default: 1000).
+            email_max_retries (int): Retries of an email after a temporary failure (default: 3).
+            email_retry_backoff (float): Seconds before the first retry, doubled for each next one (default: 0.5).
+            job_queue_name (str): Prefix of the Redis keys of the background job queue (default: 'jobs').
+            job_concurrency (int): Jobs a worker process runs at once (default: 4).
+            job_max_retries (int): Retries of a failed job before it is moved to the dead list (default: 3).
+            job_retry_backoff (float): Seconds before a failed job is retried, doubled for each next one (default: 5).
+            upload_staging_dir (str): Directory where uploads wait for their job; shared with the workers (default: 'uploads').
+            avatar_storage (str): Where avatars are stored, 'cloudinary' or 'local' (default: 'cloudinary').
+            avatar_size (int): Width and height avatars are resized to before storing (default: 250).
+            avatar_dir (str): Directory of the 'local' avatar storage (default: 'avatars').
+            avatar_base_url (str): URL the 'local' avatar directory is served at (default: '/avatars').
+            contact_cache_ttl (int): Seconds a cached contact response is kept (default: 300).
+            contact_cache_size (int): Maximum number of contact responses cached per worker (default: 10000).
+            rate_limit_redis (bool): Also enforce rate limits across workers through Redis (default: False).
+            rate_limit_cache_size (int): Maximum number of rate limit buckets kept per route and worker (default: 100000).
+            metrics_token (str): Bearer token required by ``/internal/metrics``; the endpoint is disabled when empty (default: '').
 
         """
     sqlalchemy_database_url: str
@@ -31,10 +65,43 @@ class Settings(BaseConfig):
     mail_server: str
     redis_host: str = 'localhost'
     redis_port: int = 6379
+    redis_connect_timeout: float = 2
+    redis_cache_timeout: float = 0.25
     cloudinary_name: str
     cloudinary_api_key: str
     cloudinary_api_secret: str
-    sqlalchemy_database_url: int
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    password_hash_workers: int = 2
+    password_hash_queue_size: int = 32
+    password_hash_processes: bool = False
+    user_cache_ttl: int = 60
+    user_cache_size: int = 10000
+    user_cache_redis: bool = False
+    token_cache_size: int = 10000
+    import_batch_size: int = 1000
+    email_pool_size: int = 2
+    email_batch_size: int = 50
+    email_queue_size: int = 1000
+    email_max_retries: int = 3
+    email_retry_backoff: float = 0.5
+    job_queue_name: str = 'jobs'
+    job_concurrency: int = 4
+    job_max_retries: int = 3
+    job_retry_backoff: float = 5
+    upload_staging_dir: str = 'uploads'
+    avatar_storage: str = 'cloudinary'
+    avatar_size: int = 250
+    avatar_dir: str = 'avatars'
+    avatar_base_url: str = '/avatars'
+    contact_cache_ttl: int = 300
+    contact_cache_size: int = 10000
+    rate_limit_redis: bool = False
+    rate_limit_cache_size: int = 100000
+    metrics_token: str = ''
 
     class Config:
         """
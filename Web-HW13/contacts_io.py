@@ -0,0 +1,173 @@
+import codecs
+import csv
+import io
+import json
+from typing import AsyncIterator, BinaryIO, Iterator, List, Sequence, Tuple
+
+import orjson
+from pydantic import ValidationError
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from models import User
+from repository import CONTACT_FIELDS, stream_contacts
+from schemas import ContactModel
+
+EXPORT_FIELDS = ("id", "first_name", "last_name", "email", "phone_number", "born_date", "another_info")
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+Batch = Tuple[List[Tuple[int, dict]], List[Tuple[int, str]]]
+
+
+def detect_format(filename: str | None, content_type: str | None) -> str | None:
+    """
+    Guesses the format of an uploaded contact file from its name or content type.
+
+    Args:
+        filename (str | None): Name of the uploaded file.
+        content_type (str | None): MIME type sent by the client.
+
+    Returns:
+        str | None: "csv", "ndjson", or None if it cannot be told.
+    """
+    name = (filename or "").lower()
+    kind = (content_type or "").lower()
+    if name.endswith(".csv") or "csv" in kind:
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in kind or "jsonl" in kind:
+        return "ndjson"
+    return None
+
+
+def _iter_records(file: BinaryIO, fmt: str) -> Iterator[Tuple[int, dict | None, str | None]]:
+    lines = codecs.iterdecode(file, "utf-8-sig")
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, "Too many fields"
+                continue
+            yield reader.line_num, {key: value for key, value in row.items() if value not in ("", None)}, None
+        return
+    for line_num, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as err:
+            yield line_num, None, f"Invalid JSON: {err.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line_num, None, "Expected a JSON object"
+            continue
+        yield line_num, record, None
+
+
+def iter_contact_batches(file: BinaryIO, fmt: str, batch_size: int) -> Iterator[Batch]:
+    """
+    Streams an uploaded CSV or NDJSON file as batches of validated contact rows.
+
+    The file is read incrementally, so memory use depends on ``batch_size`` rather than on the
+    file size. Every record is validated with :class:`schemas.ContactModel`.
+
+    Args:
+        file (BinaryIO): Uploaded file opened in binary mode.
+        fmt (str): "csv" (with a header row) or "ndjson" (one JSON object per line).
+        batch_size (int): Maximum number of records per batch.
+
+    Yields:
+        Batch: ``(line, row)`` pairs of valid rows as column dicts, and ``(line, error)`` pairs for
+        rejected records. A file that is not valid UTF-8 or CSV ends the stream with an error.
+    """
+    rows, errors = [], []
+    line_num = 0
+    records = _iter_records(file, fmt)
+    while True:
+        try:
+            line_num, record, error = next(records)
+        except StopIteration:
+            break
+        except (UnicodeDecodeError, csv.Error) as err:
+            errors.append((line_num + 1, f"Unreadable file, import stopped: {err}"))
+            break
+        if record is not None:
+            try:
+                rows.append((line_num, ContactModel(**record).dict()))
+            except ValidationError as err:
+                error = "; ".join(f"{'.'.join(map(str, item['loc']))}: {item['msg']}" for item in err.errors())
+        if error is not None:
+            errors.append((line_num, error))
+        if len(rows) + len(errors) >= batch_size:
+            yield rows, errors
+            rows, errors = [], []
+    if rows or errors:
+        yield rows, errors
+
+
+
+def encode_rows(rows: Sequence, fmt: str) -> bytes:
+    """
+    Serializes a chunk of exported rows (tuples in :data:`EXPORT_FIELDS` order).
+
+    Args:
+        rows (Sequence): Rows to encode.
+        fmt (str): "csv" or "ndjson".
+
+    Returns:
+        bytes: The encoded chunk, one line per row.
+    """
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
+    return b"".join(orjson.dumps(dict(zip(EXPORT_FIELDS, row)), option=orjson.OPT_APPEND_NEWLINE)
+                    for row in rows)
+
+
+def dump_contacts(rows: Sequence, fields: Sequence[str] = CONTACT_FIELDS) -> bytes:
+    """
+    Encodes selected contact rows as a JSON array with orjson, skipping Pydantic entirely.
+
+    The rows must come from :func:`repository.contact_columns`, which already returns every value in
+    the type the response carries; trailing columns beyond ``fields`` are left out.
+
+    Args:
+        rows (Sequence): Rows with the ``fields`` columns first.
+        fields (Sequence[str]): Names of the leading columns.
+
+    Returns:
+        bytes: The JSON body.
+    """
+    return orjson.dumps([dict(zip(fields, row)) for row in rows])
+
+
+def dump_contact(row, fields: Sequence[str] = CONTACT_FIELDS) -> bytes:
+    """
+    Encodes a single contact row like :func:`dump_contacts`, as a JSON object.
+    """
+    return orjson.dumps(dict(zip(fields, row)))
+
+
+async def export_contacts(session_factory: async_sessionmaker, current_user: User, fmt: str,
+                          chunk_size: int = 1000) -> AsyncIterator[bytes]:
+    """
+    Produces a user's contacts as a stream of encoded chunks for a ``StreamingResponse``.
+
+    The export owns its database session, which stays open until the stream is exhausted or the
+    client disconnects.
+
+    Args:
+        session_factory (async_sessionmaker): Factory for the export's session.
+        current_user (User): User whose contacts are exported.
+        fmt (str): "csv" (with a header row) or "ndjson".
+        chunk_size (int): Rows per fetched and encoded chunk.
+
+    Yields:
+        bytes: Encoded chunks of the export.
+    """
+    if fmt == "csv":
+        yield encode_rows([EXPORT_FIELDS], fmt)
+    async with session_factory() as db:
+        async for rows in stream_contacts(db, current_user, EXPORT_FIELDS, chunk_size):
+            yield encode_rows(rows, fmt)
@@ -1,28 +1,150 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config import settings
 
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_url(url: str | URL) -> URL:
+    """
+    Rewrites a database URL so that it uses an asyncio-compatible driver.
+
+    Args:
+        url (str | URL): Database URL, possibly pointing at a blocking driver such as psycopg2.
+
+    Returns:
+        URL: The same URL with the driver swapped for its asyncio counterpart.
+    """
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long checkouts wait for a connection.
+
+    Attributes:
+        checkouts (int): Number of checkouts served.
+        timeouts (int): Number of checkouts that gave up after ``pool_timeout``.
+        wait_total (float): Total seconds spent waiting for connections.
+        wait_max (float): Longest single wait in seconds.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+
+def build_engine(url: str | URL | None = None, **kwargs) -> AsyncEngine:
+    """
+    Creates an asyncio engine configured from the application settings.
+
+    This is the single place engines are built; the application, migrations and benchmarks all go
+    through it. No connection is opened until the engine is first used. Server databases get a
+    :class:`MeteredQueuePool` sized from the ``db_pool_*`` settings; SQLite keeps its default pool.
+
+    Args:
+        url (str | URL | None): Database URL, defaults to ``settings.sqlalchemy_database_url``.
+        **kwargs: Extra keyword arguments passed to ``create_async_engine``.
+
+    Returns:
+        AsyncEngine: The configured engine.
+    """
+    url = get_async_url(url or settings.sqlalchemy_database_url)
+    if url.get_backend_name() != "sqlite" and "poolclass" not in kwargs:
+        kwargs = {
+            "poolclass": MeteredQueuePool,
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+            "pool_recycle": settings.db_pool_recycle,
+            "pool_pre_ping": settings.db_pool_pre_ping,
+            **kwargs,
+        }
+    return create_async_engine(url, **kwargs)
+
+
+def pool_status(engine: AsyncEngine) -> dict:
+    """
+    Reports live gauges of the engine's connection pool.
+
+    Args:
+        engine (AsyncEngine): Engine whose pool to inspect.
+
+    Returns:
+        dict: Pool size, checked-out/checked-in/overflow counts and checkout wait statistics.
+    """
+    pool = engine.pool
+    if not isinstance(pool, MeteredQueuePool):
+        return {"pool": pool.status()}
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": pool.checkouts,
+        "timeouts": pool.timeouts,
+        "wait_avg_ms": round(pool.wait_total / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+        "wait_max_ms": round(pool.wait_max * 1000, 3),
+    }
+
+
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = build_engine(SQLALCHEMY_DATABASE_URL)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 
 # Dependency
-def get_db():
+async def get_db():
     """
-    Dependency function to get a database session.
+    Dependency function to get an asynchronous database session.
 
     Returns:
-        sqlalchemy.orm.Session: A database session.
+        sqlalchemy.ext.asyncio.AsyncSession: A database session.
 
     Yields:
-        sqlalchemy.orm.Session: A database session.
+        sqlalchemy.ext.asyncio.AsyncSession: A database session.
 
     """
 
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def get_session_factory():
+    """
+    Dependency returning the session factory, for handlers that must open sessions themselves.
+
+    Streaming responses are sent after ``get_db`` has already closed its session, so they open
+    their own session from this factory for the duration of the stream.
+
+    Returns:
+        async_sessionmaker: Factory of asynchronous database sessions.
+    """
+    return SessionLocal
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+import repository as repository_users
+from avatars import avatar_storage, resize_avatar
+from cache import redis_client
+from config import settings
+from db import SessionLocal
+from my_email import send_emails
+
+logger = logging.getLogger(__name__)
+
+class JobQueue:
+    """
+        Durable job queue kept in Redis lists, processed by separate worker processes.
+
+        :meth:`enqueue` pushes a JSON job onto ``<name>:queued``. A worker atomically moves it to
+        its own ``<name>:processing:<worker id>`` list, runs the registered handler and removes it
+        when the handler returns. A failed job is parked in the ``<name>:delayed`` sorted set for
+        ``backoff``, ``2 * backoff``, ... seconds and moved to ``<name>:dead`` after
+        ``max_retries`` retries, after which the job's ``on_dead`` callback, if any, releases what
+        it held. Payloads that cannot be decoded go straight to the dead list. A worker restarted
+        with the same id first requeues the jobs it was running when it stopped.
+
+        Attributes:
+            redis (redis.asyncio.Redis): Redis client holding the lists.
+            name (str): Prefix of the Redis keys.
+            max_retries (int): Retries of a failed job before it is moved to the dead list.
+            backoff (float): Seconds before the first retry.
+            handlers (Dict[str, Callable]): Registered job handlers by job name.
+            on_dead (Dict[str, Callable]): Callbacks run with the arguments of a job given up on, by job name.
+        """
+
+    def __init__(self, redis_client: redis.Redis, name: str = "jobs", max_retries: int = 3, backoff: float = 5):
+        self.redis = redis_client
+        self.name = name
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.handlers: Dict[str, Callable[..., Awaitable]] = {}
+        self.on_dead: Dict[str, Callable[..., None]] = {}
+
+    @property
+    def queued_key(self) -> str:
+        return f"{self.name}:queued"
+
+    @property
+    def delayed_key(self) -> str:
+        return f"{self.name}:delayed"
+
+    @property
+    def dead_key(self) -> str:
+        return f"{self.name}:dead"
+
+    def processing_key(self, worker_id: str) -> str:
+        return f"{self.name}:processing:{worker_id}"
+
+    def job(self, name: str, on_dead: Optional[Callable[..., None]] = None):
+        """
+                Registers the decorated coroutine function as the handler of jobs called ``name``.
+
+                Args:
+                    name (str): Job name.
+                    on_dead (Optional[Callable]): Called with the job's arguments when it is moved to
+                        the dead list, e.g. to delete files it was given.
+                """
+        def register(handler):
+            self.handlers[name] = handler
+            if on_dead is not None:
+                self.on_dead[name] = on_dead
+            return handler
+        return register
+
+    async def enqueue(self, name: str, /, **kwargs) -> str:
+        """
+                Queues a ``name`` job whose handler will be called with ``kwargs``.
+
+                Args:
+                    name (str): Registered job name.
+                    **kwargs: JSON-serializable handler arguments.
+
+                Returns:
+                    str: Id of the queued job.
+                """
+        job_id = uuid.uuid4().hex
+        await self.redis.lpush(self.queued_key, json.dumps({"id": job_id, "name": name, "kwargs": kwargs,
+                                                            "attempts": 0}))
+        return job_id
+
+    async def depth(self) -> dict:
+        """
+                Returns the number of queued, delayed (waiting to be retried) and dead jobs.
+                """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            queued, delayed, dead = await pipe.llen(self.queued_key).zcard(self.delayed_key) \
+                .llen(self.dead_key).execute()
+        return {"queued": queued, "delayed": delayed, "dead": dead}
+
+    async def _promote_due(self) -> None:
+        for raw in await self.redis.zrangebyscore(self.delayed_key, 0, time.time()):
+            # Only the worker whose ZREM succeeds requeues the job.
+            if await self.redis.zrem(self.delayed_key, raw):
+                await self.redis.lpush(self.queued_key, raw)
+
+    async def _requeue_abandoned(self, worker_id: str) -> None:
+        while await self.redis.lmove(self.processing_key(worker_id), self.queued_key, "RIGHT", "LEFT"):
+            pass
+
+    async def _process(self, raw: bytes, worker_id: str) -> None:
+        try:
+            job = json.loads(raw)
+            name, kwargs = job["name"], job["kwargs"]
+        except (ValueError, TypeError, KeyError) as err:
+            logger.error("Dropping malformed job %r: %r", raw, err)
+            await self.redis.lpush(self.dead_key, raw)
+            await self.redis.lrem(self.processing_key(worker_id), 1, raw)
+            return
+        try:
+            await self.handlers[name](**kwargs)
+        except Exception as err:
+            job["attempts"] = job.get("attempts", 0) + 1
+            if job["attempts"] > self.max_retries or name not in self.handlers:
+                logger.error("Job %s %s failed for good after %d attempts: %r", name, job.get("id"),
+                             job["attempts"], err)
+                await self.redis.lpush(self.dead_key, json.dumps(job))
+                self._release(name, kwargs)
+            else:
+                logger.warning("Job %s %s failed, retrying: %r", name, job.get("id"), err)
+                retry_at = time.time() + self.backoff * 2 ** (job["attempts"] - 1)
+                await self.redis.zadd(self.delayed_key, {json.dumps(job): retry_at})
+        finally:
+            await self.redis.lrem(self.processing_key(worker_id), 1, raw)
+
+    def _release(self, name: str, kwargs: dict) -> None:
+        on_dead = self.on_dead.get(name)
+        if on_dead is None:
+            return
+        try:
+            on_dead(**kwargs)
+        except Exception:
+            logger.exception("Cleanup of dead job %s failed", name)
+
+    async def work(self, concurrency: int = 4, worker_id: Optional[str] = None, burst: bool = False,
+                   stop: Optional[asyncio.Event] = None) -> None:
+        """
+                Runs jobs until ``stop`` is set or, in ``burst`` mode, until no job is left.
+
+                Args:
+                    concurrency (int): Maximum number of jobs run at once.
+                    worker_id (Optional[str]): Stable worker name; defaults to host name and pid.
+                    burst (bool): Return once the queue is empty instead of waiting for jobs.
+                    stop (Optional[asyncio.Event]): Event that ends the loop; running jobs are awaited.
+                """
+        worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        stop = stop or asyncio.Event()
+        slots = asyncio.Semaphore(concurrency)
+        running = set()
+        await self._requeue_abandoned(worker_id)
+        while not stop.is_set():
+            await slots.acquire()
+            await self._promote_due()
+            raw = await self.redis.blmove(self.queued_key, self.processing_key(worker_id), 1, "RIGHT", "LEFT")
+            if raw is None:
+                slots.release()
+                if burst and not running and not await self.redis.zcount(self.delayed_key, 0, time.time()):
+                    break
+                await asyncio.sleep(0.01 if running else 0)
+                continue
+            task = asyncio.create_task(self._process(raw, worker_id))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+        if running:
+            await asyncio.gather(*running)
+
+
+job_queue = JobQueue(redis_client, settings.job_queue_name, settings.job_max_retries, settings.job_retry_backoff)
+
+
+async def queue_depth() -> Optional[dict]:
+    """
+        Returns :meth:`JobQueue.depth` of :data:`job_queue`, or None if Redis is unreachable.
+        """
+    try:
+        return await job_queue.depth()
+    except (RedisError, OSError):
+        return None
+
+
+@job_queue.job("send_verification_email")
+async def send_verification_email(email: str, username: str, host: str):
+    # The dispatcher retries temporary failures and logs what it drops; failing the job as well
+    # would multiply SMTP attempts and retry permanent rejections until the job is dead-lettered.
+    await asyncio.gather(*await send_emails([(email, username)], host))
+
+
+def discard_staged_avatar(path: str, **_) -> None:
+    Path(path).unlink(missing_ok=True)
+
+
+@job_queue.job("update_avatar", on_dead=discard_staged_avatar)
+async def update_avatar(email: str, username: str, path: str):
+    data = await asyncio.to_thread(resize_avatar, path, settings.avatar_size)
+    src_url = await avatar_storage.save(f'NotesApp/{username}', data)
+    async with SessionLocal() as db:
+        await repository_users.update_avatar(email, src_url, db)
+    Path(path).unlink(missing_ok=True)
+
+
+def staging_path(suffix: str = "") -> Path:
+    """
+        Returns a new file path in ``settings.upload_staging_dir`` for handing an upload to a job.
+        """
+    directory = Path(settings.upload_staging_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{uuid.uuid4().hex}{suffix}"
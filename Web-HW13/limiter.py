@@ -0,0 +1,118 @@
+import math
+import time
+from typing import Optional
+
+import redis.asyncio as redis
+from fastapi import HTTPException, Request, status
+from jose import JWTError
+from redis.exceptions import RedisError
+
+from auth import auth_service
+from cache import TTLCache, cache_redis_client
+from config import settings
+
+# Token bucket kept in a Redis hash; the clock is Redis' own so all workers agree on it.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(retry_after)
+"""
+
+
+def identify(request: Request) -> str:
+    """
+    Returns who a request is limited as: the token's subject if it carries a valid bearer
+    token, otherwise the client address.
+
+    Tokens are checked with :meth:`auth.Auth.decode_token`, whose cache makes this free for
+    tokens already seen, and without touching the database.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return f"user:{auth_service.decode_token(token)['sub']}"
+        except (JWTError, KeyError):
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class RateLimiter:
+    """
+        FastAPI dependency allowing each user ``times`` requests per ``seconds`` on a route.
+
+        Every worker keeps a token bucket per route and user in memory, so most checks cost no
+        I/O. With a Redis client the limit is also enforced across workers by a token bucket in
+        Redis, updated atomically by a Lua script; the local bucket still rejects a flood
+        without a Redis round-trip. If Redis fails, the local limit alone applies.
+
+        Attributes:
+            times (int): Requests allowed per period, also the burst size.
+            seconds (float): Length of the period.
+            name (Optional[str]): Bucket name; defaults to the method and path of the route.
+            redis (Optional[redis.asyncio.Redis]): Client for the global limit.
+            buckets (TTLCache): Local buckets as ``(tokens, updated)`` by route and user.
+        """
+
+    def __init__(self, times: int, seconds: float, name: Optional[str] = None,
+                 redis_client: Optional[redis.Redis] = None, maxsize: int = settings.rate_limit_cache_size):
+        self.times = times
+        self.seconds = seconds
+        self.rate = times / seconds
+        self.name = name
+        self.redis = redis_client
+        self.buckets = TTLCache(maxsize, ttl=seconds)
+        self._script = redis_client.register_script(TOKEN_BUCKET_LUA) if redis_client is not None else None
+
+    def _take_local(self, key: str) -> float:
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        tokens = self.times if bucket is None else min(self.times, bucket[0] + (now - bucket[1]) * self.rate)
+        if tokens < 1:
+            return (1 - tokens) / self.rate
+        self.buckets.set(key, (tokens - 1, now))
+        return 0
+
+    async def _take_global(self, key: str) -> float:
+        try:
+            return float(await self._script(keys=[f"ratelimit:{key}"], args=[self.times, self.rate]))
+        except (RedisError, OSError):
+            return 0
+
+    async def __call__(self, request: Request):
+        """
+                Takes a token for the request's user.
+
+                Raises:
+                    HTTPException: 429 with a Retry-After header if the user is over the limit.
+                """
+        route = request.scope.get("route")
+        name = self.name or f"{request.method}:{route.path if route else request.url.path}"
+        key = f"{name}:{identify(request)}"
+        retry_after = self._take_local(key)
+        if not retry_after and self._script is not None:
+            retry_after = await self._take_global(key)
+        if retry_after:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests",
+                                headers={"Retry-After": str(math.ceil(retry_after))})
+
+
+def rate_limit(times: int, seconds: float, name: Optional[str] = None) -> RateLimiter:
+    """
+    Creates a :class:`RateLimiter` that uses Redis for the global limit when
+    ``settings.rate_limit_redis`` is set.
+    """
+    return RateLimiter(times, seconds, name, cache_redis_client if settings.rate_limit_redis else None)
@@ -1,10 +1,36 @@
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 
 import routes
+from auth import auth_service
+from cache import user_cache
+from config import settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+        Starts and stops the per-worker resources of the application: the subscription that keeps
+        :data:`cache.user_cache` in step with writes made by other processes, and the password
+        hasher.
+
+        Args:
+            app (FastAPI): The application instance.
+        """
+    listener = asyncio.create_task(user_cache.listen())
+    yield
+    listener.cancel()
+    await asyncio.gather(listener, return_exceptions=True)
+    auth_service.password_hasher.shutdown()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,8 +41,13 @@ app.add_middleware(
 )
 
 
-app.include_router(routes.app, prefix='/contacts')
-app.include_router(routes.router, prefix='/auth')
+app.include_router(routes.app, prefix='/api')
+app.include_router(routes.router, prefix='/api')
+app.include_router(routes.internal)
+
+if settings.avatar_storage == 'local':
+    Path(settings.avatar_dir).mkdir(parents=True, exist_ok=True)
+    app.mount(settings.avatar_base_url, StaticFiles(directory=settings.avatar_dir), name='avatars')
 
 
 
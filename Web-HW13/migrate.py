@@ -0,0 +1,31 @@
+"""
+Explicit schema setup command.
+
+Run it once per deployment, before starting the workers, instead of creating tables on import::
+
+    python migrate.py          # upgrade to the latest revision
+    python migrate.py 0001     # upgrade to a specific revision
+"""
+import sys
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+
+ALEMBIC_INI = Path(__file__).parent / "alembic.ini"
+
+
+def migrate(revision: str = "head") -> None:
+    """
+    Upgrades the database schema to the given Alembic revision.
+
+    Args:
+        revision (str): Target revision (default: "head").
+    """
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    command.upgrade(config, revision)
+
+
+if __name__ == "__main__":
+    migrate(*sys.argv[1:2])
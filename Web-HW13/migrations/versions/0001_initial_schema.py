@@ -0,0 +1,50 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-04-20 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('username', sa.String(50)),
+        sa.Column('email', sa.String(250), nullable=False, unique=True),
+        sa.Column('password', sa.String(255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('avatar', sa.String(255), nullable=True),
+        sa.Column('refresh_token', sa.String(255), nullable=True),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'contacts',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('first_name', sa.String()),
+        sa.Column('last_name', sa.String()),
+        sa.Column('email', sa.String()),
+        sa.Column('phone_number', sa.Integer()),
+        sa.Column('born_date', sa.Integer()),
+        sa.Column('another_info', sa.String()),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE')),
+        if_not_exists=True,
+    )
+    # Databases created by the old create_all() predate this column.
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('users')}
+    if 'confirmed' not in columns:
+        op.add_column('users', sa.Column('confirmed', sa.Boolean(), server_default=sa.false(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_table('contacts')
+    op.drop_table('users')
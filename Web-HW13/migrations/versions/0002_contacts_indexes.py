@@ -0,0 +1,34 @@
+"""indexes for per-user contact queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-04-20 12:30:00
+
+"""
+from alembic import op
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_contacts_user_id_id': ['user_id', 'id'],
+    'ix_contacts_user_id_last_name_id': ['user_id', 'last_name', 'id'],
+    'ix_contacts_user_id_email': ['user_id', 'email'],
+}
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the contacts table writable while the indexes build on PostgreSQL;
+    # it cannot run inside a transaction, hence the autocommit block.
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.create_index(name, 'contacts', columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.drop_index(name, table_name='contacts', if_exists=True, postgresql_concurrently=True)
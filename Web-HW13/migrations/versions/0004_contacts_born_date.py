@@ -0,0 +1,88 @@
+"""store born_date as a date with an indexed month-day key
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-05-04 09:00:00
+
+Existing integer values are read as YYYYMMDD (e.g. 19900415). Values that are not a valid date
+in that form cannot be interpreted and become NULL.
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10_000
+
+contacts = sa.table(
+    'contacts',
+    sa.column('id', sa.Integer),
+    sa.column('born_date', sa.Integer),
+    sa.column('born_on', sa.Date),
+    sa.column('birthday_key', sa.Integer),
+)
+
+
+def parse_yyyymmdd(value):
+    try:
+        return date(value // 10000, value // 100 % 100, value % 100)
+    except (TypeError, ValueError):
+        return None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('born_on', sa.Date(), nullable=True))
+    op.add_column('contacts', sa.Column('birthday_key', sa.Integer(), nullable=True))
+
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(contacts.c.id, contacts.c.born_date)
+            .where(contacts.c.born_date.is_not(None), contacts.c.id > last_id)
+            .order_by(contacts.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            born_on = parse_yyyymmdd(row.born_date)
+            if born_on is not None:
+                updates.append({'row_id': row.id, 'born_on': born_on,
+                                'birthday_key': born_on.month * 100 + born_on.day})
+        if updates:
+            bind.execute(
+                contacts.update().where(contacts.c.id == sa.bindparam('row_id'))
+                .values(born_on=sa.bindparam('born_on'), birthday_key=sa.bindparam('birthday_key')),
+                updates,
+            )
+        last_id = rows[-1].id
+
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.drop_column('born_date')
+        batch_op.alter_column('born_on', new_column_name='born_date')
+    op.create_index('ix_contacts_user_id_birthday_key', 'contacts', ['user_id', 'birthday_key'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birthday_key', table_name='contacts')
+    op.add_column('contacts', sa.Column('born_int', sa.Integer(), nullable=True))
+    bind = op.get_bind()
+    dated = sa.table('contacts', sa.column('id', sa.Integer), sa.column('born_date', sa.Date),
+                     sa.column('born_int', sa.Integer))
+    rows = bind.execute(sa.select(dated.c.id, dated.c.born_date).where(dated.c.born_date.is_not(None))).all()
+    if rows:
+        bind.execute(
+            dated.update().where(dated.c.id == sa.bindparam('row_id')).values(born_int=sa.bindparam('born_int')),
+            [{'row_id': row.id, 'born_int': int(row.born_date.strftime('%Y%m%d'))} for row in rows],
+        )
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.drop_column('birthday_key')
+        batch_op.drop_column('born_date')
+        batch_op.alter_column('born_int', new_column_name='born_date')
@@ -0,0 +1,28 @@
+"""add row version columns to contacts and users
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-05-11 09:00:00
+
+The constant server default lets PostgreSQL add the columns without rewriting the tables.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('version', sa.Integer(), nullable=False, server_default=sa.text('1')))
+    op.add_column('users', sa.Column('version', sa.Integer(), nullable=False, server_default=sa.text('1')))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('version')
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.drop_column('version')
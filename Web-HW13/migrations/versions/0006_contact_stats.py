@@ -0,0 +1,56 @@
+"""add per-user contact counts by last-name letter
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-05-18 09:00:00
+
+The counts are filled from the existing contacts, grouped by user and first character of the last
+name in SQL; the characters are mapped to letters as the application does.
+"""
+from collections import Counter
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+contacts = sa.table(
+    'contacts',
+    sa.column('user_id', sa.Integer),
+    sa.column('last_name', sa.String),
+)
+
+
+def contact_letter(initial):
+    initial = initial or ""
+    return initial.upper()[:1] if initial.upper() != initial.lower() else "#"
+
+
+def upgrade() -> None:
+    stats = op.create_table(
+        'contact_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('letter', sa.String(length=1), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id', 'letter'),
+    )
+
+    initial = sa.func.substr(contacts.c.last_name, 1, 1)
+    rows = op.get_bind().execute(
+        sa.select(contacts.c.user_id, initial, sa.func.count())
+        .where(contacts.c.user_id.is_not(None)).group_by(contacts.c.user_id, initial)
+    ).all()
+    counts = Counter()
+    for user_id, first, count in rows:
+        counts[user_id, contact_letter(first)] += count
+    if counts:
+        op.bulk_insert(stats, [{'user_id': user_id, 'letter': letter, 'count': count}
+                               for (user_id, letter), count in counts.items()])
+
+
+def downgrade() -> None:
+    op.drop_table('contact_stats')
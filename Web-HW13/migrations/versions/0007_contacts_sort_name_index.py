@@ -0,0 +1,32 @@
+"""index contacts by last name with NULL read as an empty string
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-05-25 09:00:00
+
+Listing by last name now sorts and pages on ``coalesce(last_name, '')`` (see
+``models.contact_sort_name``), so the plain column index is replaced by one on that expression.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_contacts_user_id_last_name_id'
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX, table_name='contacts', if_exists=True, postgresql_concurrently=True)
+        op.create_index(INDEX, 'contacts', ['user_id', sa.text("coalesce(last_name, '')"), 'id'],
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX, table_name='contacts', postgresql_concurrently=True)
+        op.create_index(INDEX, 'contacts', ['user_id', 'last_name', 'id'], postgresql_concurrently=True)
@@ -0,0 +1,31 @@
+"""widen contacts.phone_number to BIGINT
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2024-06-01 09:00:00
+
+Full international numbers such as 380501112233 do not fit in INTEGER. PostgreSQL rewrites the
+table and its indexes, the search index included; downgrading fails while any number is too large.
+SQLite INTEGER columns already hold 64-bit values, and rebuilding the table there would drop the
+expression index of 0007, so SQLite is left as it is.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.alter_column('contacts', 'phone_number', type_=sa.BigInteger(), existing_type=sa.Integer())
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.alter_column('contacts', 'phone_number', type_=sa.Integer(), existing_type=sa.BigInteger())
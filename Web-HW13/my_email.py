@@ -1,15 +1,25 @@
+import asyncio
+import logging
+import re
+from email.message import EmailMessage
+from email.utils import formataddr
 from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+import aiosmtplib
+from fastapi_mail import ConnectionConfig
+from jinja2 import Template
+from markupsafe import escape
 from pydantic import EmailStr
 from config import settings
 from auth import auth_service
 
+logger = logging.getLogger(__name__)
+
 conf = ConnectionConfig(
     MAIL_USERNAME=settings.mail_username,
     MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=EmailStr(settings.mail_from),
+    MAIL_FROM=settings.mail_from,
     MAIL_PORT=settings.mail_port,
     MAIL_SERVER=settings.mail_server,
     MAIL_FROM_NAME="Rest API Application",
@@ -22,29 +32,292 @@ conf = ConnectionConfig(
 )
 
 
-async def send_email(email: EmailStr, username: str, host: str):
+class CachedTemplate:
+    """
+        A compiled Jinja template that renders by filling precomputed static text.
+
+        The template is rendered once with a marker in place of every variable and the output is
+        split on the markers. Rendering then only joins the static parts with the (escaped, if
+        the environment autoescapes) values. This is only correct for templates that use the
+        variables as plain ``{{ name }}`` substitutions; otherwise, which is checked on creation,
+        every call falls back to the full Jinja render.
+
+        Attributes:
+            template (Template): The compiled template.
+            variables (Sequence[str]): Names of the template variables.
+            parts (List[str] | None): Static text and variable names, alternating; None if not splittable.
+        """
+    MARKER = "\x00{}\x00"
+
+    def __init__(self, template: Template, variables: Sequence[str]):
+        self.template = template
+        self.variables = tuple(variables)
+        autoescape = template.environment.autoescape
+        if callable(autoescape):
+            autoescape = autoescape(template.name)
+        self._escape = escape if autoescape else str
+        self.parts = self._split()
+
+    def _split(self) -> Optional[List[str]]:
+        rendered = self.template.render({name: self.MARKER.format(name) for name in self.variables})
+        parts = re.split(r"\x00(\w+)\x00", rendered)
+        if any(name not in self.variables for name in parts[1::2]):
+            return None
+        sample = {name: f"<{name}&{index}>" for index, name in enumerate(self.variables)}
+        self.parts = parts
+        if self._fill(sample) != self.template.render(sample):
+            return None
+        return parts
+
+    def _fill(self, context: dict) -> str:
+        parts = self.parts[:]
+        for index in range(1, len(parts), 2):
+            parts[index] = self._escape(context.get(parts[index], ""))
+        return "".join(parts)
+
+    def render(self, **context) -> str:
+        """
+                Renders the template with ``context``.
+                """
+        if self.parts is None:
+            return self.template.render(context)
+        return self._fill(context)
+
+    def render_many(self, contexts: Iterable[dict]) -> List[str]:
+        """
+                Renders the template once for each context.
+                """
+        return [self.render(**context) for context in contexts]
+
+
+template_env = conf.template_engine()
+template_env.auto_reload = False
+verification_template = CachedTemplate(template_env.get_template("email_template.html"),
+                                       ("host", "username", "token"))
+
+
+def _is_permanent(err: Exception) -> bool:
+    if isinstance(err, aiosmtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(err, aiosmtplib.SMTPResponseException) and 500 <= err.code < 600
+
+
+class EmailDispatcher:
+    """
+        Sends queued emails over a small pool of persistent SMTP connections.
+
+        :meth:`send` only puts the message on a queue, so requests never wait for the mail
+        server. Each of ``pool_size`` workers keeps one connection open, takes up to
+        ``batch_size`` queued messages at a time and sends them over that connection. A message
+        that fails temporarily is retried on a new connection after ``backoff``, ``2 * backoff``,
+        ... seconds and dropped after ``max_retries`` retries; 5xx replies are not retried.
+
+        Attributes:
+            smtp_options (dict): Keyword arguments for :class:`aiosmtplib.SMTP`.
+            pool_size (int): Number of workers, each with its own connection.
+            batch_size (int): Messages a worker takes from the queue at once.
+            queue_size (int): Messages allowed to wait; :meth:`send` waits when the queue is full.
+            max_retries (int): Retries of a message after a temporary failure.
+            backoff (float): Seconds before the first retry.
+            sent (int): Messages delivered to the server.
+            failed (int): Messages dropped after a permanent failure or the last retry.
+            connections (int): SMTP connections opened so far.
+        """
+
+    def __init__(self, smtp_options: dict, pool_size: int = 2, batch_size: int = 50, queue_size: int = 1000,
+                 max_retries: int = 3, backoff: float = 0.5):
+        self.smtp_options = smtp_options
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.sent = 0
+        self.failed = 0
+        self.connections = 0
+        self.queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """
+                Starts the workers on the running event loop.
+                """
+        if self._workers:
+            return
+        self.queue = asyncio.Queue(self.queue_size)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.pool_size)]
+
+    async def stop(self, timeout: float = 5) -> None:
+        """
+                Waits up to ``timeout`` seconds for queued messages to be sent, then stops the workers;
+                messages still unsent resolve to False.
+                """
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        while not self.queue.empty():
+            _, delivered = self.queue.get_nowait()
+            if not delivered.done():
+                delivered.set_result(False)
+
+    async def send(self, message: EmailMessage) -> asyncio.Future:
+        """
+                Queues ``message`` for sending, starting the workers if needed.
+
+                Returns:
+                    asyncio.Future: Resolves to True once the message is sent, or False if it was dropped.
+                """
+        self.start()
+        delivered = asyncio.get_running_loop().create_future()
+        await self.queue.put((message, delivered))
+        return delivered
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(**self.smtp_options)
+        await smtp.connect()
+        self.connections += 1
+        return smtp
+
+    async def _work(self):
+        smtp = None
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                while len(batch) < self.batch_size and not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                try:
+                    for message, delivered in batch:
+                        smtp = await self._process(smtp, message, delivered)
+                finally:
+                    # Whoever awaits a message of a batch cut short by cancellation must not hang.
+                    for _, delivered in batch:
+                        if not delivered.done():
+                            delivered.set_result(False)
+        finally:
+            if smtp is not None and smtp.is_connected:
+                smtp.close()
+
+    async def _process(self, smtp: Optional[aiosmtplib.SMTP], message: EmailMessage,
+                       delivered: asyncio.Future) -> Optional[aiosmtplib.SMTP]:
+        sent = self.sent
+        try:
+            smtp = await self._deliver(smtp, message)
+        except Exception:
+            # An unexpected error drops this message only; the connection is in an unknown state.
+            logger.exception("Dropping email to %s after an unexpected error", message["To"])
+            self.failed += 1
+            if smtp is not None and smtp.is_connected:
+                smtp.close()
+            smtp = None
+        finally:
+            self.queue.task_done()
+        if not delivered.done():
+            delivered.set_result(self.sent > sent)
+        return smtp
+
+    async def _deliver(self, smtp: Optional[aiosmtplib.SMTP], message: EmailMessage) -> Optional[aiosmtplib.SMTP]:
+        attempt = 0
+        while True:
+            reused = smtp is not None and smtp.is_connected
+            try:
+                if not reused:
+                    smtp = await self._connect()
+                await smtp.send_message(message)
+                self.sent += 1
+                return smtp
+            except (aiosmtplib.SMTPException, OSError) as err:
+                if _is_permanent(err):
+                    self.failed += 1
+                    logger.warning("Dropping email to %s rejected by the server: %s", message["To"], err)
+                    return smtp
+                if smtp is not None and smtp.is_connected:
+                    smtp.close()
+                smtp = None
+                if reused:
+                    # The server may have dropped an idle connection; reconnect without counting a retry.
+                    continue
+                attempt += 1
+                if attempt > self.max_retries:
+                    self.failed += 1
+                    logger.warning("Dropping email to %s after %d retries: %s", message["To"], self.max_retries, err)
+                    return None
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+
+
+email_dispatcher = EmailDispatcher(
+    {
+        "hostname": conf.MAIL_SERVER,
+        "port": conf.MAIL_PORT,
+        "username": conf.MAIL_USERNAME if conf.USE_CREDENTIALS else None,
+        "password": conf.MAIL_PASSWORD if conf.USE_CREDENTIALS else None,
+        "use_tls": conf.MAIL_SSL_TLS,
+        "start_tls": conf.MAIL_STARTTLS,
+        "validate_certs": conf.VALIDATE_CERTS,
+    },
+    pool_size=settings.email_pool_size,
+    batch_size=settings.email_batch_size,
+    queue_size=settings.email_queue_size,
+    max_retries=settings.email_max_retries,
+    backoff=settings.email_retry_backoff,
+)
+
+
+def build_verification_emails(recipients: Iterable[Tuple[str, str]], host: str) -> List[EmailMessage]:
     """
-        Sends an email for email verification.
+        Renders verification emails for many recipients with the cached template.
 
         Args:
-            email (EmailStr): Email address of the recipient.
-            username (str): Username of the recipient.
+            recipients (Iterable[Tuple[str, str]]): Email address and username of each recipient.
             host (str): Host URL for email verification link.
 
-        Raises:
-            ConnectionErrors: If there's an error connecting to the email server.
+        Returns:
+            List[EmailMessage]: One message per recipient, in order.
         """
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
+    recipients = list(recipients)
+    bodies = verification_template.render_many(
+        {"host": host, "username": username, "token": auth_service.create_email_token({"sub": email})}
+        for email, username in recipients
+    )
+    sender = formataddr((conf.MAIL_FROM_NAME, conf.MAIL_FROM))
+    messages = []
+    for (email, _), body in zip(recipients, bodies):
+        message = EmailMessage()
+        message["From"] = sender
+        message["To"] = email
+        message["Subject"] = "Confirm your email "
+        message.set_content(body, subtype="html")
+        messages.append(message)
+    return messages
+
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
+async def send_emails(recipients: Iterable[Tuple[str, str]], host: str) -> List[asyncio.Future]:
+    """
+        Queues verification emails for many recipients on :data:`email_dispatcher`.
 
+        Args:
+            recipients (Iterable[Tuple[str, str]]): Email address and username of each recipient.
+            host (str): Host URL for email verification link.
+
+        Returns:
+            List[asyncio.Future]: Delivery result of each message (see :meth:`EmailDispatcher.send`).
+        """
+    return [await email_dispatcher.send(message) for message in build_verification_emails(recipients, host)]
+
+
+async def send_email(email: EmailStr, username: str, host: str):
+    """
+        Queues an email for email verification on :data:`email_dispatcher`.
+
+        Args:
+            email (EmailStr): Email address of the recipient.
+            username (str): Username of the recipient.
+            host (str): Host URL for email verification link.
+        """
+    await send_emails([(email, username)], host)
@@ -1,193 +1,544 @@
-from typing import List
-from db import get_db
-from fastapi import Depends
-from sqlalchemy.orm import Session
-from models import Contacts, User
-from schemas import ContactBase, ContactResponse, UserModel
-from libgravatar import Gravatar
+import base64
+import binascii
+import json
+from collections import Counter
+from datetime import date, timedelta
+from typing import AsyncIterator, Iterable, List, Sequence, Set, Tuple
+from sqlalchemy import Row, String, case, cast, delete, insert, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import ContactStats, Contacts, User, contact_letter, contact_search_document, contact_sort_name, \
+    to_birthday_key
+from cache import contact_cache, user_cache
+from schemas import ContactBase, ContactModel, ContactResponse, UserModel
+from avatars import gravatar_url
 
 
-async def get_contacts(skip: int, limit: int, db: Session) -> List[Contacts]:
+CONTACT_SORTS = ("id", "last_name")
+
+# Types of the keyset values in a cursor, by sort key (see :func:`encode_cursor`).
+CURSOR_TYPES = {"id": (int,), "last_name": (str, int)}
+# Range of contact ids a cursor may point after; larger numbers cannot be bound as BIGINT.
+CURSOR_ID_RANGE = range(1, 2 ** 63)
+
+CONTACT_FIELDS = tuple(ContactResponse.model_fields)
+
+
+def contact_columns(fields: Sequence[str]) -> list:
     """
-    Retrieves a list of contacts with specified pagination parameters.
+    Returns the ``Contacts`` columns to select for the given response fields.
+
+    ``phone_number`` is cast to text in SQL, as :class:`schemas.ContactResponse` renders it, so the
+    selected rows can be encoded to JSON as they are.
 
     Args:
-        skip (int): Number of contacts to skip.
-        limit (int): Maximum number of contacts to return.
-        db (Session): Database session.
+        fields (Sequence[str]): Names of ``Contacts`` columns.
 
     Returns:
-        List[Contacts]: List of contacts.
+        list: Column expressions labelled with the field names.
     """
-    return db.query(Contacts).offset(skip).limit(limit).all()
+    return [cast(Contacts.phone_number, String).label(field) if field == "phone_number" else getattr(Contacts, field)
+            for field in fields]
 
 
-async def get_contact(contact_id: int, db: Session) -> Contacts:
+def _select_contacts(columns: Sequence[str] | None):
+    return select(*contact_columns(columns)) if columns is not None else select(Contacts)
+
+
+async def _fetch_contacts(db: AsyncSession, stmt, columns: Sequence[str] | None) -> List[Contacts] | Sequence[Row]:
+    if columns is not None:
+        return (await db.execute(stmt)).all()
+    return (await db.scalars(stmt)).all()
+
+
+def encode_cursor(contact: Contacts, sort: str = "id") -> str:
     """
-    Retrieves a single contact by its ID.
+    Builds an opaque pagination cursor pointing just after the given contact.
+
+    Args:
+        contact (Contacts): Last contact of the current page.
+        sort (str): Sort key of the listing, either "id" or "last_name".
+
+    Returns:
+        str: URL-safe cursor to pass back as ``cursor`` for the next page.
+    """
+    key = [contact.id] if sort == "id" else [contact.last_name or "", contact.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str = "id") -> list:
+    """
+    Decodes a cursor produced by :func:`encode_cursor`.
+
+    Args:
+        cursor (str): Opaque cursor received from the client.
+        sort (str): Sort key of the listing, either "id" or "last_name".
+
+    Returns:
+        list: The keyset values, ``[id]`` or ``[last_name, id]``.
+
+    Raises:
+        ValueError: If the cursor is malformed, its values do not have the types of the sort key or
+            its id is out of range.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as err:
+        raise ValueError("Malformed cursor") from err
+    types = CURSOR_TYPES[sort]
+    if not isinstance(key, list) or len(key) != len(types) \
+            or not all(type(value) is expected for value, expected in zip(key, types)):
+        raise ValueError("Cursor does not match the requested sort")
+    if key[-1] not in CURSOR_ID_RANGE:
+        raise ValueError("Cursor id is out of range")
+    return key
+
+
+def _contact_values(values: dict) -> dict:
+    if "born_date" in values:
+        values = {**values, "birthday_key": to_birthday_key(values["born_date"])}
+    return values
+
+
+# INSERT constructs with ON CONFLICT support, by dialect name.
+UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+async def _count_letters(db: AsyncSession, user_id: int, added: Iterable[str | None] = (),
+                         removed: Iterable[str | None] = ()) -> None:
+    """
+    Adjusts the user's :class:`models.ContactStats` for contacts with the ``added`` last names
+    gaining and the ``removed`` ones leaving, with at most one upsert in the caller's transaction.
+
+    Args:
+        db (AsyncSession): Database session of the write being counted.
+        user_id (int): Owner of the contacts.
+        added (Iterable[str | None]): Last names of new or renamed contacts.
+        removed (Iterable[str | None]): Last names of deleted contacts, or renamed ones before the change.
+    """
+    deltas = Counter(map(contact_letter, added))
+    deltas.subtract(map(contact_letter, removed))
+    values = [{"user_id": user_id, "letter": letter, "count": delta} for letter, delta in deltas.items() if delta]
+    if not values:
+        return
+    stmt = UPSERTS[db.get_bind().dialect.name](ContactStats).values(values)
+    await db.execute(stmt.on_conflict_do_update(index_elements=[ContactStats.user_id, ContactStats.letter],
+                                                set_={"count": ContactStats.count + stmt.excluded.count}))
+
+
+
+async def get_contact(contact_id: int, db: AsyncSession, current_user: User,
+                      columns: Sequence[str] | None = None) -> Contacts | Row | None:
+    """
+    Retrieves a single contact of the user by its ID.
 
     Args:
         contact_id (int): ID of the contact to retrieve.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
+        current_user (User): Owner of the contact.
+        columns (Sequence[str] | None): Select only these columns and return a plain row.
 
     Returns:
-        Contacts: The contact with the specified ID.
+        Contacts | Row | None: The contact with the specified ID, or None if the user has no such contact.
     """
-    return db.query(Contacts).filter(Contacts.id == contact_id).first()
+    stmt = _select_contacts(columns).filter(Contacts.id == contact_id, Contacts.user_id == current_user.id)
+    return (await db.execute(stmt)).first() if columns is not None else await db.scalar(stmt)
 
 
-async def create_contact(body: ContactResponse, db: Session = Depends(get_db)) -> Contacts:
+async def create_contact(body: ContactModel, db: AsyncSession, current_user: User) -> Contacts:
     """
-    Creates a new contact.
+    Creates a new contact with a single ``INSERT ... RETURNING`` and counts it in the user's stats.
+    The id is always assigned by the database, even if ``body`` carries one.
 
     Args:
-        body (ContactResponse): Data for the new contact.
-        db (Session, optional): Database session. Defaults to Depends(get_db).
+        body (ContactModel): Data for the new contact.
+        db (AsyncSession): Database session.
+        current_user (User): Owner of the new contact.
 
     Returns:
         Contacts: The newly created contact.
     """
-    contact_data = body.dict()
-    contact = Contacts(**contact_data)
-    db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    contact = await db.scalar(
+        insert(Contacts).values(**_contact_values(body.dict(exclude={"id"})), user_id=current_user.id)
+        .returning(Contacts)
+    )
+    await _count_letters(db, current_user.id, added=[contact.last_name])
+    await db.commit()
+    await contact_cache.bump(current_user.id)
     return contact
 
 
-async def update_contact(contact_id: int, body: ContactResponse, db: Session) -> Contacts | None:
+async def import_contacts(rows: List[dict], db: AsyncSession, current_user: User) -> int:
     """
-    Updates an existing contact.
+    Inserts a batch of contacts for a user in a single statement, counts them in the user's stats
+    and commits it.
 
     Args:
-        contact_id (int): ID of the contact to update.
-        body (ContactResponse): Updated data for the contact.
-        db (Session): Database session.
+        rows (List[dict]): Validated contact column values.
+        db (AsyncSession): Database session.
+        current_user (User): Owner of the new contacts.
 
     Returns:
-        Contacts | None: The updated contact, or None if the contact does not exist.
+        int: Number of contacts inserted.
+    """
+    await db.execute(insert(Contacts), [{**row, "user_id": current_user.id} for row in rows])
+    await _count_letters(db, current_user.id, added=[row.get("last_name") for row in rows])
+    await db.commit()
+    await contact_cache.bump(current_user.id)
+    return len(rows)
+
+
+async def update_contact(contact_id: int, body: ContactModel, db: AsyncSession,
+                         current_user: User) -> Contacts | None:
     """
-    contact = db.query(Contacts).filter(Contacts.id == contact_id).first()
-    if contact:
-        for attr, value in body.dict(exclude_unset=True).items():
-            setattr(contact, attr, value)
-        db.commit()
-        db.refresh(contact)
+    Updates an existing contact with a single ``UPDATE ... RETURNING``.
 
+    A change of last name also moves the contact between letters in the user's stats, which takes
+    reading (and locking) the old last name first.
+
+    Args:
+        contact_id (int): ID of the contact to update.
+        body (ContactModel): Updated data for the contact; only the fields that were sent are changed.
+        db (AsyncSession): Database session.
+        current_user (User): Owner of the contact.
+
+    Returns:
+        Contacts | None: The updated contact, or None if the user has no such contact.
+    """
+    values = _contact_values(body.dict(exclude_unset=True, exclude={"id"}))
+    if not values:
+        return await get_contact(contact_id, db, current_user)
+    condition = (Contacts.id == contact_id, Contacts.user_id == current_user.id)
+    if "last_name" in values:
+        old_name = await db.scalar(select(Contacts.last_name).where(*condition).with_for_update())
+    contact = await db.scalar(
+        update(Contacts).where(*condition)
+        .values(**values).returning(Contacts).execution_options(populate_existing=True)
+    )
+    if contact is not None and "last_name" in values:
+        await _count_letters(db, current_user.id, added=[contact.last_name], removed=[old_name])
+    await db.commit()
+    await contact_cache.bump(current_user.id)
     return contact
 
 
-async def delete_contact(contact_id: int, db: Session) -> Contacts | None:
+async def delete_contact(contact_id: int, db: AsyncSession, current_user: User) -> Contacts | None:
     """
-    Deletes a contact.
+    Deletes a contact with a single ``DELETE ... RETURNING`` and uncounts it from the user's stats.
 
     Args:
         contact_id (int): ID of the contact to delete.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
+        current_user (User): Owner of the contact.
 
     Returns:
-        Contacts | None: The deleted contact, or None if the contact does not exist.
+        Contacts | None: The deleted contact, or None if the user has no such contact.
     """
-    contact = db.query(Contacts).filter(Contacts.id == contact_id).first()
-    if contact:
-        db.delete(contact)
-        db.commit()
+    contact = await db.scalar(
+        delete(Contacts).where(Contacts.id == contact_id, Contacts.user_id == current_user.id).returning(Contacts)
+    )
+    if contact is not None:
+        await _count_letters(db, current_user.id, removed=[contact.last_name])
+    await db.commit()
+    await contact_cache.bump(current_user.id)
     return contact
 
 
-async def get_user_by_email(email: str, db: Session) -> User:
+async def update_contacts(changes: List[Tuple[List[int], dict]], db: AsyncSession, current_user: User) -> Set[int]:
+    """
+    Applies several changes to the user's contacts in one transaction.
+
+    Each change is a single ``UPDATE ... WHERE id IN (...) RETURNING id``, so contacts that get the
+    same values are updated together. If last names change, the old ones are read (and locked)
+    first and the user's stats are adjusted with one more statement.
+
+    Args:
+        changes (List[Tuple[List[int], dict]]): Pairs of contact ids and the column values to set on them.
+        db (AsyncSession): Database session.
+        current_user (User): Owner of the contacts; other users' contacts are never touched.
+
+    Returns:
+        Set[int]: Ids of the contacts that were updated.
+    """
+    renamed = {contact_id for ids, values in changes if "last_name" in values for contact_id in ids}
+    old_names = {}
+    if renamed:
+        old_names = dict((await db.execute(
+            select(Contacts.id, Contacts.last_name)
+            .where(Contacts.user_id == current_user.id, Contacts.id.in_(renamed)).with_for_update()
+        )).all())
+    new_names = {}
+    for ids, values in changes:
+        result = await db.execute(
+            update(Contacts).where(Contacts.user_id == current_user.id, Contacts.id.in_(ids))
+            .values(**_contact_values(values)).returning(Contacts.id, Contacts.last_name)
+            .execution_options(synchronize_session=False)
+        )
+        new_names.update(result.all())
+    if old_names:
+        await _count_letters(db, current_user.id, added=[new_names[contact_id] for contact_id in old_names],
+                             removed=old_names.values())
+    await db.commit()
+    await contact_cache.bump(current_user.id)
+    return set(new_names)
+
+
+async def delete_contacts(ids: List[int], db: AsyncSession, current_user: User) -> Set[int]:
+    """
+    Deletes several of the user's contacts with a single ``DELETE ... RETURNING`` and uncounts them
+    from the user's stats.
+
+    Args:
+        ids (List[int]): Ids of the contacts to delete.
+        db (AsyncSession): Database session.
+        current_user (User): Owner of the contacts; other users' contacts are never touched.
+
+    Returns:
+        Set[int]: Ids of the contacts that were deleted.
+    """
+    result = await db.execute(
+        delete(Contacts).where(Contacts.user_id == current_user.id, Contacts.id.in_(ids))
+        .returning(Contacts.id, Contacts.last_name).execution_options(synchronize_session=False)
+    )
+    deleted = dict(result.all())
+    await _count_letters(db, current_user.id, removed=deleted.values())
+    await db.commit()
+    await contact_cache.bump(current_user.id)
+    return set(deleted)
+
+
+async def get_user_by_email(email: str, db: AsyncSession) -> User:
     """
     Retrieves a user by their email address.
 
     Args:
         email (str): Email address of the user.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
         User: The user with the specified email address.
     """
-    return db.query(User).filter(User.email == email).first()
+    return await db.scalar(select(User).filter(User.email == email))
 
 
-async def create_user(body: UserModel, db: Session) -> User:
+async def get_user_version(user_id: int, db: AsyncSession) -> int | None:
     """
-    Creates a new user.
+    Reads only the row version of a user, to check a cached copy against the database.
+
+    Args:
+        user_id (int): ID of the user.
+        db (AsyncSession): Database session.
+
+    Returns:
+        int | None: The user's current ``version``, or None if the user no longer exists.
+    """
+    return await db.scalar(select(User.version).filter(User.id == user_id))
+
+
+async def create_user(body: UserModel, db: AsyncSession) -> User:
+    """
+    Creates a new user with a single ``INSERT ... RETURNING``; the avatar defaults to the user's Gravatar.
 
     Args:
         body (UserModel): Data for the new user.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
         User: The newly created user.
+
+    Raises:
+        IntegrityError: If a user with the same email already exists.
     """
-    avatar = None
-    try:
-        g = Gravatar(body.email)
-        avatar = g.get_image()
-    except Exception as e:
-        print(e)
-    new_user = User(**body.dict(), avatar=avatar)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    new_user = await db.scalar(insert(User).values(**body.dict(), avatar=gravatar_url(body.email)).returning(User))
+    await db.commit()
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
+async def update_token(user: User, token: str | None, db: AsyncSession) -> None:
     """
     Updates the refresh token for a user.
 
     Args:
         user (User): User for whom to update the token.
         token (str | None): New refresh token value.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
     """
     user.refresh_token = token
-    db.commit()
+    await db.commit()
+    await user_cache.invalidate(user.email)
 
 
-async def get_contacts(skip: int, limit: int, db: Session, current_user: User) -> List[Contacts]:
+async def get_contacts(skip: int, limit: int, db: AsyncSession, current_user: User,
+                       cursor: list | None = None, sort: str = "id",
+                       columns: Sequence[str] | None = None) -> List[Contacts] | Sequence[Row]:
     """
     Retrieves contacts belonging to a specific user with specified pagination parameters.
 
+    When ``cursor`` is given the page is fetched with a keyset condition instead of ``OFFSET``,
+    so the cost of a page does not grow with its depth and ``skip`` is ignored.
+
     Args:
         skip (int): Number of contacts to skip.
         limit (int): Maximum number of contacts to return.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
         current_user (User): User whose contacts are being retrieved.
+        cursor (list | None): Decoded keyset of the last contact of the previous page.
+        sort (str): Sort key, either "id" or "last_name".
+        columns (Sequence[str] | None): Select only these columns (see :func:`contact_columns`) and
+                                        return plain rows, bypassing the identity map and ORM
+                                        instrumentation, instead of ``Contacts`` objects.
+
+    Returns:
+        List[Contacts] | Sequence[Row]: List of contacts belonging to the current user.
+    """
+    stmt = _select_contacts(columns).filter(Contacts.user_id == current_user.id)
+    if sort == "last_name":
+        stmt = stmt.order_by(contact_sort_name(), Contacts.id)
+        if cursor is not None:
+            stmt = stmt.filter(tuple_(contact_sort_name(), Contacts.id) > tuple_(*cursor))
+    else:
+        stmt = stmt.order_by(Contacts.id)
+        if cursor is not None:
+            stmt = stmt.filter(Contacts.id > cursor[0])
+    if cursor is None:
+        stmt = stmt.offset(skip)
+    return await _fetch_contacts(db, stmt.limit(limit), columns)
+
+
+async def search_contacts(query: str, limit: int, db: AsyncSession, current_user: User,
+                          cursor: list | None = None,
+                          columns: Sequence[str] | None = None) -> List[Contacts] | Sequence[Row]:
+    """
+    Searches the user's contacts by a substring of first name, last name, email or phone number.
+
+    Matching is case-insensitive. On PostgreSQL the ``ILIKE`` is served by the trigram index on
+    :func:`models.contact_search_document`; other databases fall back to ``LIKE``.
+
+    Args:
+        query (str): Text to look for.
+        limit (int): Maximum number of contacts to return.
+        db (AsyncSession): Database session.
+        current_user (User): User whose contacts are searched.
+        cursor (list | None): Decoded keyset (``[id]``) of the last contact of the previous page.
+        columns (Sequence[str] | None): Select only these columns, as in :func:`get_contacts`.
+
+    Returns:
+        List[Contacts] | Sequence[Row]: Matching contacts ordered by id.
+    """
+    pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    stmt = _select_contacts(columns).filter(Contacts.user_id == current_user.id) \
+        .filter(contact_search_document().ilike(pattern, escape="\\")).order_by(Contacts.id)
+    if cursor is not None:
+        stmt = stmt.filter(Contacts.id > cursor[0])
+    return await _fetch_contacts(db, stmt.limit(limit), columns)
+
+
+async def stream_contacts(db: AsyncSession, current_user: User, columns: Sequence[str],
+                          chunk_size: int = 1000) -> AsyncIterator[Sequence[Row]]:
+    """
+    Streams the user's contacts in chunks through a server-side cursor.
+
+    Only the requested columns are selected and no ORM objects are built, so memory use is bound by
+    ``chunk_size`` regardless of how many contacts the user has.
+
+    Args:
+        db (AsyncSession): Database session, kept open while the stream is consumed.
+        current_user (User): User whose contacts are exported.
+        columns (Sequence[str]): Names of the ``Contacts`` columns to select.
+        chunk_size (int): Number of rows fetched per round-trip.
+
+    Yields:
+        Sequence[Row]: Up to ``chunk_size`` rows ordered by id.
+    """
+    stmt = select(*(getattr(Contacts, column) for column in columns)) \
+        .filter(Contacts.user_id == current_user.id).order_by(Contacts.id) \
+        .execution_options(yield_per=chunk_size)
+    result = await db.stream(stmt)
+    async for rows in result.partitions():
+        yield rows
+
+
+async def get_upcoming_birthdays(days: int, db: AsyncSession, current_user: User, today: date | None = None,
+                                 columns: Sequence[str] | None = None) -> List[Contacts] | Sequence[Row]:
+    """
+    Retrieves the user's contacts whose birthday falls within the next ``days`` days.
+
+    The window is a range over the indexed ``birthday_key`` (``MMDD``); a window crossing the
+    new year is split into its December and January parts.
+
+    Args:
+        days (int): Size of the window in days, today included.
+        db (AsyncSession): Database session.
+        current_user (User): User whose contacts are checked.
+        today (date | None): Start of the window (default: the current date).
+        columns (Sequence[str] | None): Select only these columns, as in :func:`get_contacts`.
+
+    Returns:
+        List[Contacts] | Sequence[Row]: Contacts ordered by how soon their birthday comes.
+    """
+    today = today or date.today()
+    start = to_birthday_key(today)
+    end = to_birthday_key(today + timedelta(days=days))
+    stmt = _select_contacts(columns).filter(Contacts.user_id == current_user.id)
+    if days >= 365:
+        stmt = stmt.filter(Contacts.birthday_key.is_not(None))
+    elif start <= end:
+        stmt = stmt.filter(Contacts.birthday_key.between(start, end))
+    else:
+        stmt = stmt.filter(or_(Contacts.birthday_key >= start, Contacts.birthday_key <= end))
+    stmt = stmt.order_by(case((Contacts.birthday_key >= start, 0), else_=1), Contacts.birthday_key, Contacts.id)
+    return await _fetch_contacts(db, stmt, columns)
+
+
+async def get_contact_stats(db: AsyncSession, current_user: User) -> dict:
+    """
+    Reads the user's contact count and last-name letter histogram from :class:`models.ContactStats`.
+
+    Costs one primary-key range read however many contacts the user has.
+
+    Args:
+        db (AsyncSession): Database session.
+        current_user (User): User whose contacts are counted.
 
     Returns:
-        List[Contacts]: List of contacts belonging to the current user.
+        dict: ``total`` contacts and ``letters``, the non-zero counts by letter in alphabetical order.
     """
-    return db.query(Contacts).filter_by(user=current_user).offset(skip).limit(limit).all()
+    rows = await db.execute(
+        select(ContactStats.letter, ContactStats.count)
+        .where(ContactStats.user_id == current_user.id, ContactStats.count > 0).order_by(ContactStats.letter)
+    )
+    letters = dict(rows.all())
+    return {"total": sum(letters.values()), "letters": letters}
 
 
-async def confirmed_email(email: str, db: Session) -> None:
+async def confirmed_email(email: str, db: AsyncSession) -> None:
     """
     Marks a user's email as confirmed.
 
     Args:
         email (str): Email address of the user.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
     """
     user = await get_user_by_email(email, db)
     user.confirmed = True
-    db.commit()
+    await db.commit()
+    await user_cache.invalidate(user.email)
 
 
-async def update_avatar(email, url: str, db: Session) -> User:
+async def update_avatar(email, url: str, db: AsyncSession) -> User:
     """
     Updates a user's avatar URL.
 
     Args:
         email (str): Email address of the user.
         url (str): New avatar URL.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
         User: The updated user.
     """
     user = await get_user_by_email(email, db)
     user.avatar = url
-    db.commit()
+    await db.commit()
+    await user_cache.invalidate(user.email)
     return user
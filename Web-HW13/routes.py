@@ -1,24 +1,33 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, status, Security, Request, Response, UploadFile, File, Query
 from fastapi.security import (
     OAuth2PasswordRequestForm,
     HTTPAuthorizationCredentials,
     HTTPBearer,
 )
-from sqlalchemy.orm import Session
-from db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import get_db, get_session_factory, engine, pool_status
 import repository as repository_contacts
 from models import User
-from schemas import ContactResponse, UserResponse, UserModel, TokenModel, RequestEmail
-from typing import List
+from schemas import ContactModel, ContactResponse, UserResponse, UserModel, TokenModel, RequestEmail, ImportResult, \
+    ImportRowError, ContactBatchUpdate, ContactBatchDelete, BatchItemResult, ContactStatsResponse
+from typing import List, Literal, Optional, Tuple
 from auth import auth_service
 import repository as repository_users
-from my_email import send_email
-from fastapi_limiter import FastAPILimiter
-from fastapi_limiter.depends import RateLimiter
-import cloudinary
-import cloudinary.uploader
+from jobs import job_queue, queue_depth, staging_path
+from avatars import check_image
+from PIL import Image, UnidentifiedImageError
+from limiter import rate_limit
+from cache import CachedResponse, contact_cache, user_cache
 from schemas import UserDb
 from config import settings
+from contacts_io import EXPORT_MEDIA_TYPES, detect_format, dump_contact, dump_contacts, export_contacts, iter_contact_batches
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+import hashlib
+import secrets
+import shutil
+from pathlib import Path
 
 
 
@@ -26,129 +35,496 @@ from config import settings
 
 app = APIRouter(prefix='/contacts', tags=["contacts"])
 router = APIRouter(prefix='/auth', tags=["auth"])
+internal = APIRouter(prefix='/internal', tags=["internal"], include_in_schema=False)
 security = HTTPBearer()
 
+MAX_REPORTED_IMPORT_ERRORS = 1000
 
+# Columns read for contact responses: the response fields, then the row version for ETags.
+CONTACT_COLUMNS = (*repository_contacts.CONTACT_FIELDS, "version")
 
+FIELDS_QUERY = Query(None, description="Comma-separated contact fields to return, e.g. ``id,last_name``; "
+                                       "all fields by default.")
 
-@app.get('/', response_model=List[ContactResponse], dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def read_contacts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """
+    Parses the ``fields`` parameter of the contact list endpoints into response field names.
+
+    Returns:
+        Tuple[str, ...]: The requested fields in :class:`schemas.ContactResponse` order, or all of them.
+
+    Raises:
+        HTTPException: 400 if a name is not a :class:`schemas.ContactResponse` field.
+    """
+    if fields is None:
+        return repository_contacts.CONTACT_FIELDS
+    names = {name.strip() for name in fields.split(",")} - {""}
+    unknown = names.difference(repository_contacts.CONTACT_FIELDS)
+    if unknown or not names:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Unknown fields: {', '.join(sorted(unknown))}" if unknown else "No fields given")
+    return tuple(field for field in repository_contacts.CONTACT_FIELDS if field in names)
+
+
+def projection(fields: Tuple[str, ...], *needed: str) -> Tuple[str, ...]:
+    """
+    Columns to select for ``fields``: the fields first, then those of ``needed`` not among them.
     """
-        Retrieve a list of contacts with specified pagination parameters.
+    return (*fields, *(column for column in needed if column not in fields))
+
+
+def cached_json(cached: CachedResponse, etag: str) -> Response:
+    """
+    Builds the JSON response for a cached body, its headers and ``etag``.
+    """
+    return Response(cached.body, media_type="application/json", headers={**cached.headers, "ETag": etag})
+
+
+def page_etag(version: str, page: str) -> str:
+    """
+    Strong ETag of a contacts response from the user's contacts version (see :class:`cache.ContactCache`).
+    """
+    return f'"{hashlib.blake2b(f"{version}:{page}".encode(), digest_size=12).hexdigest()}"'
+
+
+def rows_etag(page: str, contacts: List) -> str:
+    """
+    Strong ETag of a contacts response from the ids and row versions of its contacts.
+    """
+    rows = ",".join(f"{contact.id}.{contact.version}" for contact in contacts)
+    return f'"r{hashlib.blake2b(f"{page}:{rows}".encode(), digest_size=12).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Tells whether the request's ``If-None-Match`` header matches ``etag``.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+
+
+@app.get('/', response_model=List[ContactResponse], dependencies=[Depends(rate_limit(times=10, seconds=60))])
+async def read_contacts(request: Request, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                        sort: Literal["id", "last_name"] = "id", fields: Optional[str] = FIELDS_QUERY,
+                        db: AsyncSession = Depends(get_db),
+                        current_user: User = Depends(auth_service.get_current_user)):
+    """
+        Retrieve a list of contacts associated with the current user.
+
+        Offset pagination (``skip``/``limit``) keeps working for existing clients. Whenever a page is
+        full, the ``X-Next-Cursor`` response header carries an opaque cursor; passing it back as
+        ``cursor`` fetches the next page by keyset, which costs the same at any depth. Only the
+        response columns are selected and the rows are encoded straight to JSON with orjson (see
+        :func:`contacts_io.dump_contacts`); serialized pages are cached in :data:`cache.contact_cache`
+        until the user's contacts change. ``fields`` narrows both the response and the query to
+        the listed fields.
+
+        Responses carry a strong ``ETag`` derived from the user's contacts version; a matching
+        ``If-None-Match`` gets 304 without a database query. If the version is unavailable the
+        ETag is computed from the row versions of the page.
 
         Args:
-            skip (int): Number of contacts to skip.
+            request (Request): Incoming request, read for ``If-None-Match``.
+            skip (int): Number of contacts to skip (ignored when ``cursor`` is given).
             limit (int): Maximum number of contacts to return.
-            db (Session): Database session.
+            cursor (Optional[str]): Cursor returned by the previous page.
+            sort (str): Sort key, either "id" or "last_name".
+            fields (Optional[str]): Comma-separated fields to return (default: all).
+            db (AsyncSession): Database session.
+            current_user (User): Current authenticated user.
 
         Returns:
             List[ContactResponse]: List of contacts.
         """
-    contacts = await repository_contacts.get_contacts(skip, limit, db)
-    return contacts
+    key = None
+    if cursor is not None:
+        try:
+            key = repository_contacts.decode_cursor(cursor, sort)
+        except ValueError as err:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    fields = parse_fields(fields)
+    page = f"list:{sort}:{limit}:{cursor if cursor is not None else skip}:{','.join(fields)}"
+    version = await contact_cache.version(current_user.id)
+    etag = page_etag(version, page) if version is not None else None
+    if etag is not None and etag_matches(request, etag):
+        return not_modified(etag)
+    cached = await contact_cache.get(current_user.id, version, page)
+    if cached is None:
+        columns = projection(fields, "id", *(("last_name",) if sort == "last_name" else ()), "version")
+        contacts = await repository_contacts.get_contacts(skip, limit, db, current_user, key, sort, columns)
+        if etag is None:
+            etag = rows_etag(page, contacts)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+        headers = {}
+        if contacts and len(contacts) == limit:
+            headers["X-Next-Cursor"] = repository_contacts.encode_cursor(contacts[-1], sort)
+        cached = CachedResponse(dump_contacts(contacts, fields), headers)
+        await contact_cache.set(current_user.id, version, page, cached)
+    return cached_json(cached, etag)
+
+
+@app.get('/search', response_model=List[ContactResponse],
+         dependencies=[Depends(rate_limit(times=10, seconds=60))])
+async def search_contacts(q: str = Query(min_length=1, max_length=100),
+                          limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None,
+                          fields: Optional[str] = FIELDS_QUERY, db: AsyncSession = Depends(get_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+        Search the current user's contacts by first name, last name, email or phone number.
+
+        Results are ordered by id and paginated by cursor: when a page is full, the
+        ``X-Next-Cursor`` response header holds the cursor for the next page.
+
+        Args:
+            q (str): Text to look for (case-insensitive substring or prefix).
+            limit (int): Maximum number of contacts to return.
+            cursor (Optional[str]): Cursor returned by the previous page.
+            fields (Optional[str]): Comma-separated fields to return (default: all).
+            db (AsyncSession): Database session.
+            current_user (User): Current authenticated user.
+
+        Returns:
+            List[ContactResponse]: Matching contacts.
+        """
+    key = None
+    if cursor is not None:
+        try:
+            key = repository_contacts.decode_cursor(cursor)
+        except ValueError as err:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    fields = parse_fields(fields)
+    contacts = await repository_contacts.search_contacts(q, limit, db, current_user, key, projection(fields, "id"))
+    headers = {}
+    if contacts and len(contacts) == limit:
+        headers["X-Next-Cursor"] = repository_contacts.encode_cursor(contacts[-1])
+    return Response(dump_contacts(contacts, fields), media_type="application/json", headers=headers)
+
+
+@app.get('/stats', response_model=ContactStatsResponse)
+async def read_contact_stats(db: AsyncSession = Depends(get_db),
+                             current_user: User = Depends(auth_service.get_current_user)):
+    """
+        Retrieve the number of the current user's contacts and how many there are per first letter of
+        the last name, for an index sidebar.
+
+        Read from counters kept up to date by every contact write, so the cost does not depend on
+        how many contacts the user has.
+
+        Args:
+            db (AsyncSession): Database session.
+            current_user (User): Current authenticated user.
+
+        Returns:
+            ContactStatsResponse: The total and the per-letter counts.
+        """
+    return await repository_contacts.get_contact_stats(db, current_user)
+
+
+@app.get('/birthdays', response_model=List[ContactResponse])
+async def read_upcoming_birthdays(days: int = Query(7, ge=0, le=366), fields: Optional[str] = FIELDS_QUERY,
+                                  db: AsyncSession = Depends(get_db),
+                                  current_user: User = Depends(auth_service.get_current_user)):
+    """
+        Retrieve the current user's contacts with a birthday in the next ``days`` days.
+
+        Args:
+            days (int): Size of the window in days (default: 7).
+            fields (Optional[str]): Comma-separated fields to return (default: all).
+            db (AsyncSession): Database session.
+            current_user (User): Current authenticated user.
+
+        Returns:
+            List[ContactResponse]: Contacts ordered by upcoming birthday.
+        """
+    fields = parse_fields(fields)
+    contacts = await repository_contacts.get_upcoming_birthdays(days, db, current_user, columns=fields)
+    return Response(dump_contacts(contacts, fields), media_type="application/json")
+
+
+@app.get('/export', dependencies=[Depends(rate_limit(times=5, seconds=60))])
+async def export_contacts_file(fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+                               session_factory=Depends(get_session_factory),
+                               current_user: User = Depends(auth_service.get_current_user)):
+    """
+        Export all contacts of the current user as NDJSON or CSV.
+
+        Rows are streamed from a server-side cursor and encoded chunk by chunk, so memory stays
+        constant whatever the size of the address book.
+
+        Args:
+            fmt (str): ``format`` query parameter, "ndjson" (default) or "csv".
+            session_factory (async_sessionmaker): Factory for the session that serves the stream.
+            current_user (User): Current authenticated user.
+
+        Returns:
+            StreamingResponse: The exported contacts.
+        """
+    return StreamingResponse(
+        export_contacts(session_factory, current_user, fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="contacts.{fmt}"'},
+    )
 
 
 @app.get('/{contact_id}', response_model=ContactResponse)
-async def read_contact(contact_id: int, db: Session = Depends(get_db)):
+async def read_contact(request: Request, contact_id: int, db: AsyncSession = Depends(get_db),
+                       current_user: User = Depends(auth_service.get_current_user)):
     """
-    Retrieve a single contact by its ID.
+    Retrieve a single contact by its ID, cached and tagged like :func:`read_contacts`.
 
     Args:
+        request (Request): Incoming request, read for ``If-None-Match``.
         contact_id (int): ID of the contact to retrieve.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
+        current_user (User): Current authenticated user.
 
     Returns:
         ContactResponse: The contact with the specified ID.
     """
 
-    contact = await repository_contacts.get_contact(contact_id, db)
-    if contact is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-    return contact
-
-
-@app.post("/", response_model=ContactResponse, dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def create_contact(body: ContactResponse, db: Session = Depends(get_db)):
+    page = f"contact:{contact_id}"
+    version = await contact_cache.version(current_user.id)
+    etag = page_etag(version, page) if version is not None else None
+    if etag is not None and etag_matches(request, etag):
+        return not_modified(etag)
+    cached = await contact_cache.get(current_user.id, version, page)
+    if cached is None:
+        contact = await repository_contacts.get_contact(contact_id, db, current_user, CONTACT_COLUMNS)
+        if contact is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+        if etag is None:
+            etag = rows_etag(page, [contact])
+            if etag_matches(request, etag):
+                return not_modified(etag)
+        cached = CachedResponse(dump_contact(contact), {})
+        await contact_cache.set(current_user.id, version, page, cached)
+    return cached_json(cached, etag)
+
+
+@app.post("/", response_model=ContactResponse, dependencies=[Depends(rate_limit(times=10, seconds=60))])
+async def create_contact(body: ContactModel, db: AsyncSession = Depends(get_db),
+                         current_user: User = Depends(auth_service.get_current_user)):
     """
         Create a new contact.
 
         Args:
-            body (ContactResponse): Data for the new contact.
-            db (Session): Database session.
+            body (ContactModel): Data for the new contact.
+            db (AsyncSession): Database session.
+            current_user (User): Current authenticated user.
 
         Returns:
             ContactResponse: The newly created contact.
         """
-    return await repository_contacts.create_contact(body, db)
+    return await repository_contacts.create_contact(body, db, current_user)
+
+
+async def import_rows_one_by_one(rows: List[Tuple[int, dict]], errors: List[Tuple[int, str]], db: AsyncSession,
+                                 current_user: User) -> int:
+    """
+        Insert the rows of a batch the database rejected one at a time, collecting the rows it still refuses.
+
+        Args:
+            rows (List[Tuple[int, dict]]): ``(line, row)`` pairs of the rejected batch.
+            errors (List[Tuple[int, str]]): ``(line, error)`` pairs the refused rows are appended to.
+            db (AsyncSession): Database session.
+            current_user (User): Owner of the new contacts.
+
+        Returns:
+            int: Number of rows inserted.
+        """
+    imported = 0
+    for line, row in rows:
+        try:
+            imported += await repository_contacts.import_contacts([row], db, current_user)
+        except DBAPIError as err:
+            await db.rollback()
+            errors.append((line, f"Rejected by the database: {err.orig}"))
+    return imported
+
+
+@app.post("/import", response_model=ImportResult)
+async def import_contacts(file: UploadFile = File(),
+                          fmt: Optional[Literal["csv", "ndjson"]] = Query(None, alias="format"),
+                          db: AsyncSession = Depends(get_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+        Bulk-import contacts for the current user from a CSV or NDJSON file.
+
+        The file is parsed incrementally off the event loop and inserted in batches of
+        ``settings.import_batch_size`` rows, one statement and commit per batch. Invalid rows are
+        skipped and reported by line number; a batch rejected by the database is inserted again row by
+        row, so that only the rows the database refuses are reported.
+
+        Args:
+            file (UploadFile): CSV with a header row, or one JSON object per line.
+            fmt (Optional[str]): ``format`` query parameter, "csv" or "ndjson"; guessed from the file name
+                or type when omitted.
+            db (AsyncSession): Database session.
+            current_user (User): Current authenticated user.
+
+        Returns:
+            ImportResult: Number of imported and rejected rows, with the first errors.
+        """
+    fmt = fmt or detect_format(file.filename, file.content_type)
+    if fmt is None:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail="Upload a .csv or .ndjson file or pass format")
+    result = ImportResult()
+    batches = iterate_in_threadpool(iter_contact_batches(file.file, fmt, settings.import_batch_size))
+    async for rows, errors in batches:
+        if rows:
+            try:
+                result.imported += await repository_contacts.import_contacts([row for _, row in rows], db,
+                                                                             current_user)
+            except DBAPIError:
+                await db.rollback()
+                result.imported += await import_rows_one_by_one(rows, errors, db, current_user)
+        result.failed += len(errors)
+        room = MAX_REPORTED_IMPORT_ERRORS - len(result.errors)
+        result.errors.extend(ImportRowError(line=line, error=error) for line, error in sorted(errors)[:room])
+    return result
+
+
+@app.patch("/batch", response_model=List[BatchItemResult])
+async def update_contacts_batch(body: ContactBatchUpdate, db: AsyncSession = Depends(get_db),
+                                current_user: User = Depends(auth_service.get_current_user)):
+    """
+        Update many contacts of the current user in one transaction.
+
+        Send ``ids`` with ``changes`` to apply the same change to all of them, or ``patches`` to
+        change each contact differently. Patches with identical changes share one statement.
+
+        Args:
+            body (ContactBatchUpdate): Contacts and the changes to apply.
+            db (AsyncSession): Database session.
+            current_user (User): Current authenticated user.
+
+        Returns:
+            List[BatchItemResult]: "updated" or "not_found" for every requested id, in request order.
+        """
+    if body.ids:
+        order = body.ids
+        changes = [(body.ids, body.changes.dict(exclude_unset=True))]
+    else:
+        order = [patch.id for patch in body.patches]
+        grouped = {}
+        for patch in body.patches:
+            values = patch.dict(exclude_unset=True, exclude={"id"})
+            grouped.setdefault(tuple(sorted(values.items())), []).append(patch.id)
+        changes = [(ids, dict(values)) for values, ids in grouped.items()]
+    changes = [(ids, values) for ids, values in changes if values]
+    if not changes:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Nothing to update")
+    updated = await repository_contacts.update_contacts(changes, db, current_user)
+    return [{"id": contact_id, "status": "updated" if contact_id in updated else "not_found"}
+            for contact_id in order]
+
+
+@app.delete("/batch", response_model=List[BatchItemResult])
+async def delete_contacts_batch(body: ContactBatchDelete, db: AsyncSession = Depends(get_db),
+                                current_user: User = Depends(auth_service.get_current_user)):
+    """
+        Delete many contacts of the current user with a single statement.
+
+        Args:
+            body (ContactBatchDelete): Ids of the contacts to delete.
+            db (AsyncSession): Database session.
+            current_user (User): Current authenticated user.
+
+        Returns:
+            List[BatchItemResult]: "deleted" or "not_found" for every requested id, in request order.
+        """
+    deleted = await repository_contacts.delete_contacts(body.ids, db, current_user)
+    return [{"id": contact_id, "status": "deleted" if contact_id in deleted else "not_found"}
+            for contact_id in body.ids]
 
 
 @app.put("/{contact_id}", response_model=ContactResponse)
-async def update_contact(body: ContactResponse, contact_id: int, db: Session = Depends(get_db)):
+async def update_contact(body: ContactModel, contact_id: int, db: AsyncSession = Depends(get_db),
+                         current_user: User = Depends(auth_service.get_current_user)):
     """
             Update a contact.
 
             Args:
-                body (ContactResponse): Data for the new contact.
-                db (Session): Database session.
+                body (ContactModel): Data for the new contact.
+                db (AsyncSession): Database session.
+                current_user (User): Current authenticated user.
 
             Returns:
                 ContactResponse: The new updated contact.
             """
-    contact = await repository_contacts.update_contact(contact_id, body, db)
+    contact = await repository_contacts.update_contact(contact_id, body, db, current_user)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
     return contact
 
 
 @app.delete("/{contact_id}", response_model=ContactResponse)
-async def delete_contact(contact_id: int, db: Session = Depends(get_db)):
+async def delete_contact(contact_id: int, db: AsyncSession = Depends(get_db),
+                         current_user: User = Depends(auth_service.get_current_user)):
     """
                 Delete a contact.
 
                 Args:
                     body (ContactResponse): Data for the new contact.
-                    db (Session): Database session.
+                    db (AsyncSession): Database session.
+                    current_user (User): Current authenticated user.
 
                 Returns:
                     ContactResponse: The deleted contact.
                 """
-    contact = await repository_contacts.delete_contact(contact_id, db)
+    contact = await repository_contacts.delete_contact(contact_id, db, current_user)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
     return contact
 
 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def signup(body: UserModel, request: Request, db: AsyncSession = Depends(get_db)):
     """
-        Sign up a new user.
+        Sign up a new user. The confirmation email is sent by a job worker.
 
         Args:
             body (UserModel): Data for the new user.
-            background_tasks (BackgroundTasks): Background tasks to be executed.
             request (Request): Incoming request.
-            db (Session): Database session.
+            db (AsyncSession): Database session.
 
         Returns:
             UserResponse: Details of the newly created user.
+
+        Raises:
+            HTTPException: 409 if an account with the email already exists.
         """
-    exist_user = await repository_users.get_user_by_email(body.email, db)
-    if exist_user:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User already exists")
-    body.password = auth_service.get_password_hash(body.password)
-    new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(send_email, new_user.email, new_user.username, request.base_url)
+    body.password = await auth_service.get_password_hash(body.password)
+    try:
+        new_user = await repository_users.create_user(body, db)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
+    await job_queue.enqueue("send_verification_email", email=new_user.email, username=new_user.username,
+                            host=str(request.base_url))
     return {"user": new_user, "detail": "User successfully created. Check your email for confirmation."}
 
 
 @router.post("/login", response_model=TokenModel)
-async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """
             Login a user.
 
             Args:
                 body (UserModel): Data for the new user.
-                db (Session): Database session.
+                db (AsyncSession): Database session.
 
             Returns:
                 UserResponse: Tokens type.
@@ -158,7 +534,7 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
-    if not auth_service.verify_password(body.password, user.password):
+    if not await auth_service.verify_password(body.password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
     # Generate JWT
     access_token = await auth_service.create_access_token(data={"sub": user.email})
@@ -169,13 +545,13 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
 
 
 @router.get("/refresh_token", response_model=TokenModel)
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: AsyncSession = Depends(get_db)):
     """
         Refresh the access token using the refresh token.
 
         Args:
             credentials (HTTPAuthorizationCredentials): HTTP Authorization credentials containing the refresh token.
-            db (Session): Database session.
+            db (AsyncSession): Database session.
 
         Returns:
             TokenModel: New access token and refresh token.
@@ -192,33 +568,14 @@ async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(sec
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
-@app.get('/', response_model=List[ContactResponse])
-async def read_contacts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
-    """
-        Retrieve a list of contacts associated with the current user.
-
-        Args:
-            skip (int): Number of contacts to skip.
-            limit (int): Maximum number of contacts to return.
-            db (Session): Database session.
-            current_user (User): Current authenticated user.
-
-        Returns:
-            List[ContactResponse]: List of contacts.
-        """
-
-    contacts = await repository_contacts.get_contacts(skip, limit, db, current_user)
-    return contacts
-
-
 @router.get('/confirmed_email/{token}')
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """
         Confirm the email address associated with the provided token.
 
         Args:
             token (str): Token for email confirmation.
-            db (Session): Database session.
+            db (AsyncSession): Database session.
 
         Returns:
             dict: Confirmation message.
@@ -235,16 +592,14 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
 
 
 @router.post('/request_email')
-async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
-                        db: Session = Depends(get_db)):
+async def request_email(body: RequestEmail, request: Request, db: AsyncSession = Depends(get_db)):
     """
-    Request email confirmation.
+    Request email confirmation. The email is sent by a job worker.
 
     Args:
         body (RequestEmail): Request body containing the email address.
-        background_tasks (BackgroundTasks): Background tasks to be executed.
         request (Request): Incoming request.
-        db (Session): Database session.
+        db (AsyncSession): Database session.
 
     Returns:
         dict: Confirmation message.
@@ -252,52 +607,103 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
 
     user = await repository_users.get_user_by_email(body.email, db)
 
-    if user.confirmed:
+    if user and user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
-        background_tasks.add_task(send_email, user.email, user.username, request.base_url)
+        await job_queue.enqueue("send_verification_email", email=user.email, username=user.username,
+                                host=str(request.base_url))
     return {"message": "Check your email for confirmation."}
 
 
 
 @app.get("/me/", response_model=UserDb)
-async def read_users_me(current_user: User = Depends(auth_service.get_current_user)):
+async def read_users_me(request: Request, response: Response, db: AsyncSession = Depends(get_db),
+                        current_user: User = Depends(auth_service.get_current_user)):
     """
         Get details of the current user.
 
+        The strong ``ETag`` is the user's id and row version. The version is read from the
+        database with a single-column query, since the cached user may predate a write made by
+        another process (such as the avatar job); a stale cached copy is then replaced.
+
         Args:
+            request (Request): Incoming request, read for ``If-None-Match``.
+            response (Response): Outgoing response, used to set the ``ETag`` header.
+            db (AsyncSession): Database session.
             current_user (User): Current authenticated user.
 
         Returns:
             UserDb: Details of the current user.
         """
+    version = await repository_users.get_user_version(current_user.id, db)
+    if version is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    etag = f'"u{current_user.id}-{version}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    if version != current_user.version:
+        current_user = await user_cache.set(await repository_users.get_user_by_email(current_user.email, db))
+    response.headers["ETag"] = etag
     return current_user
 
 
-@app.patch('/avatar', response_model=UserDb)
-async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user),
-                             db: Session = Depends(get_db)):
+@app.patch('/avatar', status_code=status.HTTP_202_ACCEPTED)
+async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user)):
     """
     Update the avatar of the current user.
 
+    The upload is staged on disk and handed to a job worker, which uploads it and stores the
+    new URL; ``GET /api/contacts/me/`` shows the avatar once the job has run, since the worker's
+    cache invalidation reaches every API process (see :meth:`cache.UserCache.listen`).
+
     Args:
         file (UploadFile): Uploaded file containing the new avatar image.
         current_user (User): Current authenticated user.
-        db (Session): Database session.
 
     Returns:
-        UserDb: Details of the updated user.
+        dict: Id of the queued job.
+
+    Raises:
+        HTTPException: 422 if the file is not an image.
     """
+    path = staging_path(Path(file.filename or "").suffix)
+    with path.open("wb") as staged:
+        await run_in_threadpool(shutil.copyfileobj, file.file, staged)
+    try:
+        await run_in_threadpool(check_image, str(path))
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        path.unlink(missing_ok=True)
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="File is not a supported image")
+    job_id = await job_queue.enqueue("update_avatar", email=current_user.email, username=current_user.username,
+                                     path=str(path))
+    return {"job_id": job_id, "detail": "Avatar update accepted"}
+
+
+async def metrics_auth(credentials: Optional[HTTPAuthorizationCredentials] = Security(HTTPBearer(auto_error=False))):
+    """
+    Allow internal endpoints only to callers presenting ``settings.metrics_token``.
+
+    Args:
+        credentials (HTTPAuthorizationCredentials, optional): The bearer token of the request.
+
+    Raises:
+        HTTPException: 404 if no metrics token is configured, 401 if the token is missing or wrong.
+    """
+    if not settings.metrics_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not secrets.compare_digest(credentials.credentials.encode(),
+                                                         settings.metrics_token.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token",
+                            headers={"WWW-Authenticate": "Bearer"})
 
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
 
-    r = cloudinary.uploader.upload(file.file, public_id=f'NotesApp/{current_user.username}', overwrite=True)
-    src_url = cloudinary.CloudinaryImage(f'NotesApp/{current_user.username}')\
-                        .build_url(width=250, height=250, crop='fill', version=r.get('version'))
-    user = await repository_users.update_avatar(current_user.email, src_url, db)
-    return user
\ No newline at end of file
+@internal.get('/metrics', dependencies=[Depends(metrics_auth)])
+async def read_metrics():
+    """
+    Expose live runtime gauges for capacity planning, to callers with the metrics token.
+
+    Returns:
+        dict: Connection pool gauges of this worker (see :func:`db.pool_status`), the
+        background job queue depth (see :func:`jobs.queue_depth`) and the contact cache counters.
+    """
+    return {"db_pool": pool_status(engine), "jobs": await queue_depth(), "contact_cache": contact_cache.stats()}
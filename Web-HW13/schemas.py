@@ -1,6 +1,11 @@
-from datetime import datetime
+from datetime import date, datetime
+from typing import Dict, List, Optional
 
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, field_validator, model_validator
+
+BATCH_MAX_ITEMS = 1000
+# Largest value of the BIGINT ``contacts.phone_number`` column.
+PHONE_NUMBER_MAX = 2 ** 63 - 1
 
 
 class ContactBase(BaseModel):
@@ -25,14 +30,169 @@ class ContactResponse(ContactBase):
 
        Attributes:
            id (int): The unique identifier of the contact.
-           email (str): The email address of the contact.
-           phone_number (str): The phone number of the contact.
-           another_info (None): Additional information about the contact (default: None).
+           email (Optional[str]): The email address of the contact (default: None).
+           phone_number (Optional[str]): The phone number of the contact (default: None).
+           born_date (Optional[date]): The date of birth of the contact (default: None).
+           another_info (Optional[str]): Additional information about the contact (default: None).
        """
     id: int
-    email: str
-    phone_number: str
-    another_info: None
+    email: Optional[str] = None
+    phone_number: Optional[str] = None
+    born_date: Optional[date] = None
+    another_info: Optional[str] = None
+
+    @field_validator("phone_number", mode="before")
+    @classmethod
+    def phone_number_as_text(cls, value):
+        return str(value) if isinstance(value, int) else value
+
+
+class ContactModel(ContactBase):
+    """
+       Schema representing a contact supplied by the client: the body of a create or update,
+       or a row of a bulk import.
+
+       Inherits:
+           ContactBase: Base schema for a contact.
+
+       Attributes:
+           email (Optional[str]): The email address of the contact (default: None).
+           phone_number (Optional[int]): The phone number of the contact, digits only, at most
+               ``PHONE_NUMBER_MAX`` (default: None).
+           born_date (Optional[date]): The date of birth of the contact (default: None).
+           another_info (Optional[str]): Additional information about the contact (default: None).
+       """
+    email: Optional[str] = None
+    phone_number: Optional[int] = Field(None, ge=0, le=PHONE_NUMBER_MAX)
+    born_date: Optional[date] = None
+    another_info: Optional[str] = None
+
+
+class ContactPatch(BaseModel):
+    """
+       Schema representing a partial update of a contact; only the fields sent are changed.
+       The names can be left out but not set to null.
+
+       Attributes:
+           first_name (Optional[str]): The first name of the contact.
+           last_name (Optional[str]): The last name of the contact.
+           email (Optional[str]): The email address of the contact.
+           phone_number (Optional[int]): The phone number of the contact, digits only, at most ``PHONE_NUMBER_MAX``.
+           born_date (Optional[date]): The date of birth of the contact.
+           another_info (Optional[str]): Additional information about the contact.
+       """
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[str] = None
+    phone_number: Optional[int] = Field(None, ge=0, le=PHONE_NUMBER_MAX)
+    born_date: Optional[date] = None
+    another_info: Optional[str] = None
+
+    @field_validator("first_name", "last_name")
+    @classmethod
+    def names_not_null(cls, value):
+        # Names may be left out of a patch but not cleared: every contact keeps both.
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
+
+class ContactBatchPatch(ContactPatch):
+    """
+       Schema representing the partial update of one contact inside a batch.
+
+       Inherits:
+           ContactPatch: Fields to change.
+
+       Attributes:
+           id (int): The identifier of the contact to update.
+       """
+    id: int
+
+
+class ContactBatchUpdate(BaseModel):
+    """
+        Schema representing a batch update: either one change applied to many contacts
+        (``ids`` and ``changes``) or individual ``patches``.
+
+        Attributes:
+            ids (List[int]): Contacts that receive ``changes``.
+            changes (Optional[ContactPatch]): Change applied to every contact in ``ids``.
+            patches (List[ContactBatchPatch]): Individual changes, one per contact.
+        """
+    ids: List[int] = Field(default=[], max_length=BATCH_MAX_ITEMS)
+    changes: Optional[ContactPatch] = None
+    patches: List[ContactBatchPatch] = Field(default=[], max_length=BATCH_MAX_ITEMS)
+
+    @model_validator(mode="after")
+    def check_one_form(self):
+        if bool(self.ids) == bool(self.patches) or bool(self.ids) != (self.changes is not None):
+            raise ValueError("Send either ids with changes, or patches")
+        ids = self.ids or [patch.id for patch in self.patches]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Each contact id may appear only once")
+        return self
+
+
+class ContactBatchDelete(BaseModel):
+    """
+        Schema representing a batch delete.
+
+        Attributes:
+            ids (List[int]): Contacts to delete.
+        """
+    ids: List[int] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
+class BatchItemResult(BaseModel):
+    """
+        Schema representing the outcome of a batch operation for one contact.
+
+        Attributes:
+            id (int): The identifier of the contact.
+            status (str): "updated", "deleted" or "not_found".
+        """
+    id: int
+    status: str
+
+
+class ContactStatsResponse(BaseModel):
+    """
+        Schema representing the contact statistics of a user.
+
+        Attributes:
+            total (int): The number of contacts.
+            letters (Dict[str, int]): Contacts by first letter of the last name, "#" for any other start.
+        """
+    total: int
+    letters: Dict[str, int]
+
+
+class ImportRowError(BaseModel):
+    """
+        Schema describing a row rejected by a bulk import.
+
+        Attributes:
+            line (int): Line number of the row in the uploaded file.
+            error (str): Why the row was rejected.
+        """
+    line: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    """
+        Schema representing the outcome of a bulk import.
+
+        Attributes:
+            imported (int): Number of contacts created.
+            failed (int): Number of rows rejected.
+            errors (List[ImportRowError]): Details of the first rejected rows.
+        """
+    imported: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+
 
 class UserModel(BaseModel):
     """
@@ -56,13 +216,13 @@ class UserDb(BaseModel):
            username (str): The username of the user.
            email (str): The email address of the user.
            created_at (datetime): The datetime when the user was created.
-           avatar (str): The URL of the user's avatar.
+           avatar (Optional[str]): The URL of the user's avatar (default: None).
        """
     id: int
     username: str
     email: str
     created_at: datetime
-    avatar: str
+    avatar: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -0,0 +1,136 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Settings() requires these; tests run against SQLite unless the environment says otherwise.
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite+aiosqlite:///./test.db")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("MAIL_USERNAME", "test@example.com")
+os.environ.setdefault("MAIL_PASSWORD", "password")
+os.environ.setdefault("MAIL_FROM", "test@example.com")
+os.environ.setdefault("MAIL_PORT", "465")
+os.environ.setdefault("MAIL_SERVER", "localhost")
+os.environ.setdefault("EMAIL_RETRY_BACKOFF", "0")
+os.environ.setdefault("CLOUDINARY_NAME", "test")
+os.environ.setdefault("CLOUDINARY_API_KEY", "test")
+os.environ.setdefault("CLOUDINARY_API_SECRET", "test")
+os.environ.setdefault("METRICS_TOKEN", "test-metrics-token")
+
+import asyncio
+from contextlib import contextmanager
+
+import pytest
+from fakeredis import FakeAsyncRedis
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from auth import auth_service
+from cache import contact_cache, user_cache
+from config import settings
+from db import build_engine, get_db, get_session_factory
+from jobs import job_queue
+from limiter import RateLimiter
+from main import app
+from models import Base, User
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+
+contact_cache.redis = FakeAsyncRedis()
+user_cache.bus = FakeAsyncRedis()
+
+
+@pytest.fixture(scope="module")
+def session_factory():
+    engine = build_engine(TEST_DATABASE_URL, poolclass=NullPool)
+
+    async def reset_schema():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(reset_schema())
+    user_cache.local.clear()
+    contact_cache.local.clear()
+    contact_cache.redis = FakeAsyncRedis()
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture(scope="module")
+def client(session_factory):
+    async def override_get_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
+    real_redis, job_queue.redis = job_queue.redis, FakeAsyncRedis()
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.clear()
+    job_queue.redis = real_redis
+
+
+@pytest.fixture(scope="module")
+def user():
+    return {"username": "deadpool", "email": "deadpool@example.com", "password": "123456789"}
+
+
+@pytest.fixture(scope="module")
+def auth_headers(session_factory):
+    """Creates a confirmed user directly in the database and returns its bearer header."""
+
+    async def create_user():
+        async with session_factory() as db:
+            db.add(User(username="owner", email="owner@example.com", password="x", confirmed=True))
+            await db.commit()
+        return await auth_service.create_access_token(data={"sub": "owner@example.com"})
+
+    return {"Authorization": f"Bearer {asyncio.run(create_user())}"}
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Gives every test full rate limit buckets; the limiters are shared by the whole app."""
+    for route in app.routes:
+        for dependency in getattr(getattr(route, "dependant", None), "dependencies", []):
+            if isinstance(dependency.call, RateLimiter):
+                dependency.call.buckets.clear()
+
+
+@pytest.fixture
+def metrics_headers():
+    """Returns the bearer header accepted by the internal endpoints."""
+    return {"Authorization": f"Bearer {settings.metrics_token}"}
+
+
+class QueryCounter:
+    """Records the SQL statements sent to the database while a test runs."""
+
+    def __init__(self):
+        self.statements = []
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @contextmanager
+    def budget(self, limit: int):
+        """Fails the test if the block sends more than ``limit`` statements."""
+        start = len(self.statements)
+        yield
+        used = self.statements[start:]
+        assert len(used) <= limit, f"{len(used)} statements, budget is {limit}:\n" + "\n".join(used)
+
+
+@pytest.fixture
+def query_counter(session_factory):
+    engine = session_factory.kw["bind"].sync_engine
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter.record)
+    yield counter
+    event.remove(engine, "before_cursor_execute", counter.record)
@@ -0,0 +1,28 @@
+import unittest
+from unittest.mock import patch
+
+from jose import JWTError
+
+from auth import auth_service
+
+
+class TestDecodeToken(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        auth_service.token_cache.clear()
+
+    async def test_verified_claims_are_cached(self):
+        token = await auth_service.create_access_token(data={"sub": "test@example.com"})
+        self.assertEqual(auth_service.decode_token(token)["sub"], "test@example.com")
+        with patch("auth.jwt.decode") as decode:
+            self.assertEqual(auth_service.decode_token(token)["sub"], "test@example.com")
+            decode.assert_not_called()
+
+    async def test_expired_token_is_rejected(self):
+        token = await auth_service.create_access_token(data={"sub": "test@example.com"}, expires_delta=-1)
+        with self.assertRaises(JWTError):
+            auth_service.decode_token(token)
+        self.assertEqual(len(auth_service.token_cache), 0)
+
+    def test_invalid_token_is_rejected(self):
+        with self.assertRaises(JWTError):
+            auth_service.decode_token("not-a-token")
@@ -0,0 +1,71 @@
+import asyncio
+import io
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from sqlalchemy import select
+
+import jobs
+from avatars import AvatarStorage, LocalAvatarStorage, gravatar_url, resize_avatar
+from models import User
+
+
+def make_image(path: Path, size=(1600, 900), fmt="JPEG") -> Path:
+    Image.effect_noise(size, 64).convert("RGB").save(path, fmt)
+    return path
+
+
+def test_gravatar_url():
+    expected = "https://www.gravatar.com/avatar/0bc83cb571cd1c50ba6f3e8a78ef1346"
+    assert gravatar_url("myemailaddress@example.com") == expected
+    assert gravatar_url(" MyEmailAddress@Example.com ") == expected
+
+
+def test_resize_avatar_crops_and_shrinks(tmp_path):
+    path = make_image(tmp_path / "photo.jpg")
+    data = resize_avatar(str(path), size=250)
+    with Image.open(io.BytesIO(data)) as avatar:
+        assert (avatar.format, avatar.size) == ("JPEG", (250, 250))
+    assert len(data) < path.stat().st_size / 4
+
+
+def test_local_storage_keeps_files_under_root(tmp_path):
+    storage = LocalAvatarStorage(str(tmp_path), "/avatars/")
+    url = asyncio.run(storage.save("NotesApp/../../etc/passwd", b"data"))
+    stored = [path for path in tmp_path.rglob("*") if path.is_file()]
+    assert len(stored) == 1 and stored[0].read_bytes() == b"data"
+    assert url.startswith("/avatars/NotesApp/") and ".." not in url
+
+
+def test_update_avatar_job(session_factory, auth_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "avatar_storage", LocalAvatarStorage(str(tmp_path / "avatars"), "/avatars"))
+    monkeypatch.setattr(jobs, "SessionLocal", session_factory)
+    staged = make_image(tmp_path / "upload.png", size=(400, 300), fmt="PNG")
+
+    asyncio.run(jobs.update_avatar(email="owner@example.com", username="owner", path=str(staged)))
+
+    assert not staged.exists()
+    assert (tmp_path / "avatars" / "NotesApp" / "owner.jpg").exists()
+
+    async def avatar():
+        async with session_factory() as db:
+            return await db.scalar(select(User.avatar).where(User.email == "owner@example.com"))
+
+    assert asyncio.run(avatar()).startswith("/avatars/NotesApp/owner.jpg?v=")
+
+
+def test_avatar_route_rejects_non_images(client, auth_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs.settings, "upload_staging_dir", str(tmp_path))
+    response = client.patch("/api/contacts/avatar", headers=auth_headers,
+                            files={"file": ("me.png", b"not really a png", "image/png")})
+    assert response.status_code == 422
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_storage_backends_must_implement_save():
+    class Incomplete(AvatarStorage):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
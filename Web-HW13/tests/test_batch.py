@@ -0,0 +1,84 @@
+import asyncio
+
+from sqlalchemy import select
+
+from models import Contacts, User
+
+
+def _seed(session_factory):
+    async def seed():
+        async with session_factory() as db:
+            owner = await db.scalar(select(User.id).where(User.email == "owner@example.com"))
+            stranger = User(username="stranger", email="stranger@example.com", password="x", confirmed=True)
+            db.add(stranger)
+            await db.flush()
+            mine = [Contacts(first_name=f"Dup{i}", last_name="Doe", user_id=owner) for i in range(3)]
+            theirs = Contacts(first_name="Other", last_name="Roe", user_id=stranger.id)
+            db.add_all([*mine, theirs])
+            await db.commit()
+            return [contact.id for contact in mine], theirs.id
+
+    return asyncio.run(seed())
+
+
+def test_batch_update_and_delete(client, auth_headers, session_factory):
+    mine, theirs = _seed(session_factory)
+
+    response = client.patch("/api/contacts/batch", headers=auth_headers,
+                            json={"ids": [*mine[:2], theirs], "changes": {"last_name": "Smith",
+                                                                         "born_date": "1990-04-15"}})
+    assert response.status_code == 200, response.text
+    assert [item["status"] for item in response.json()] == ["updated", "updated", "not_found"]
+
+    response = client.patch("/api/contacts/batch", headers=auth_headers,
+                            json={"patches": [{"id": mine[0], "first_name": "A"},
+                                              {"id": mine[2], "first_name": "C"}]})
+    assert [item["status"] for item in response.json()] == ["updated", "updated"]
+
+    contacts = {contact["id"]: contact for contact in client.get("/api/contacts/", headers=auth_headers).json()}
+    assert contacts[mine[0]]["first_name"] == "A" and contacts[mine[0]]["last_name"] == "Smith"
+    assert contacts[mine[2]]["first_name"] == "C" and contacts[mine[2]]["last_name"] == "Doe"
+    birthdays = client.get("/api/contacts/birthdays", headers=auth_headers, params={"days": 366}).json()
+    assert {contact["id"] for contact in birthdays} == set(mine[:2])
+
+    response = client.request("DELETE", "/api/contacts/batch", headers=auth_headers,
+                              json={"ids": [mine[1], theirs, mine[1] + 1000]})
+    assert response.status_code == 200, response.text
+    assert [item["status"] for item in response.json()] == ["deleted", "not_found", "not_found"]
+
+    async def remaining():
+        async with session_factory() as db:
+            return set(await db.scalars(select(Contacts.id)))
+
+    assert asyncio.run(remaining()) == {mine[0], mine[2], theirs}
+
+
+def test_batch_rejects_mixed_or_duplicate_items(client, auth_headers):
+    response = client.patch("/api/contacts/batch", headers=auth_headers,
+                            json={"ids": [1], "changes": {"first_name": "A"}, "patches": [{"id": 2}]})
+    assert response.status_code == 422
+    response = client.patch("/api/contacts/batch", headers=auth_headers,
+                            json={"patches": [{"id": 1, "first_name": "A"}, {"id": 1, "first_name": "B"}]})
+    assert response.status_code == 422
+    response = client.request("DELETE", "/api/contacts/batch", headers=auth_headers, json={"ids": []})
+    assert response.status_code == 422
+
+
+def test_batch_rejects_null_names(client, auth_headers):
+    for body in ({"patches": [{"id": 1, "last_name": None}]}, {"ids": [1], "changes": {"first_name": None}}):
+        response = client.patch("/api/contacts/batch", headers=auth_headers, json=body)
+        assert response.status_code == 422, response.text
+    response = client.patch("/api/contacts/batch", headers=auth_headers,
+                            json={"patches": [{"id": 1, "another_info": None}]})
+    assert response.status_code == 200, response.text
+
+
+def test_batch_rejects_out_of_range_phone_numbers(client, auth_headers):
+    for phone_number in (10 ** 20, -1):
+        for body in ({"patches": [{"id": 1, "phone_number": phone_number}]},
+                     {"ids": [1], "changes": {"phone_number": phone_number}}):
+            response = client.patch("/api/contacts/batch", headers=auth_headers, json=body)
+            assert response.status_code == 422, response.text
+    response = client.patch("/api/contacts/batch", headers=auth_headers,
+                            json={"ids": [1], "changes": {"phone_number": 380501112233}})
+    assert response.status_code == 200, response.text
@@ -0,0 +1,44 @@
+import unittest
+from datetime import date
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import build_engine
+from models import Base, Contacts, User
+from repository import get_upcoming_birthdays
+
+
+class TestUpcomingBirthdays(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = build_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session = AsyncSession(self.engine, expire_on_commit=False)
+        self.user = User(username="owner", email="owner@example.com", password="x")
+        self.session.add(self.user)
+        await self.session.flush()
+        for name, born in [("Dec30", date(1990, 12, 30)), ("Jan02", date(1985, 1, 2)),
+                           ("Jun15", date(2000, 6, 15)), ("Jun10", date(1970, 6, 10)), ("None", None)]:
+            self.session.add(Contacts(first_name=name, born_date=born, user_id=self.user.id))
+        await self.session.commit()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    async def upcoming(self, days, today):
+        return [contact.first_name for contact in
+                await get_upcoming_birthdays(days, self.session, self.user, today)]
+
+    async def test_key_follows_born_date(self):
+        contact = Contacts(born_date=date(1999, 3, 7))
+        self.assertEqual(contact.birthday_key, 307)
+        contact.born_date = None
+        self.assertIsNone(contact.birthday_key)
+
+    async def test_window_within_year(self):
+        self.assertEqual(await self.upcoming(7, date(2024, 6, 9)), ["Jun10", "Jun15"])
+        self.assertEqual(await self.upcoming(0, date(2024, 6, 10)), ["Jun10"])
+
+    async def test_window_wraps_over_new_year(self):
+        self.assertEqual(await self.upcoming(7, date(2024, 12, 28)), ["Dec30", "Jan02"])
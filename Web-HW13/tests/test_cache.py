@@ -0,0 +1,57 @@
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from fakeredis import FakeAsyncRedis
+
+from cache import TTLCache, UserCache
+from models import User
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_expiry(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", 1, ttl=5)
+        with patch("cache.time.monotonic", return_value=time.monotonic() + 10):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.misses, 1)
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = FakeAsyncRedis()
+        self.cache = UserCache(TTLCache(maxsize=10, ttl=60), self.redis, ttl=60)
+        self.user = User(id=1, username="test", email="test@example.com", password="hash",
+                         refresh_token="token", created_at=datetime(2024, 4, 1), avatar=None, confirmed=True)
+
+    async def test_cached_copy_is_detached_and_safe(self):
+        cached = await self.cache.set(self.user)
+        self.assertIsNot(cached, self.user)
+        self.assertIsNone(cached.password)
+        self.assertIsNone(cached.refresh_token)
+        self.assertIs(await self.cache.get("test@example.com"), cached)
+
+    async def test_redis_tier_refills_local(self):
+        await self.cache.set(self.user)
+        self.cache.local.clear()
+        cached = await self.cache.get("test@example.com")
+        self.assertEqual(cached.id, 1)
+        self.assertEqual(cached.created_at, datetime(2024, 4, 1))
+        self.assertEqual(len(self.cache.local), 1)
+
+    async def test_invalidate(self):
+        await self.cache.set(self.user)
+        await self.cache.invalidate("test@example.com")
+        self.assertIsNone(await self.cache.get("test@example.com"))
+        self.assertIsNone(await self.redis.get("user:test@example.com"))
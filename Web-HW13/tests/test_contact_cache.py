@@ -0,0 +1,105 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+
+import redis.asyncio as redis
+from fakeredis import FakeAsyncRedis
+from redis.exceptions import ConnectionError
+
+import cache
+from cache import CachedResponse, ContactCache, TTLCache
+
+
+class TestContactCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.cache = ContactCache(TTLCache(100, 60), FakeAsyncRedis(), ttl=60)
+        self.page = CachedResponse(b'[{"id": 1}]', {"X-Next-Cursor": "abc"})
+
+    async def test_read_through_tiers(self):
+        version = await self.cache.version(1)
+        self.assertEqual(await self.cache.version(1), version)
+        self.assertIsNone(await self.cache.get(1, version, "list"))
+        await self.cache.set(1, version, "list", self.page)
+        self.assertEqual(await self.cache.get(1, version, "list"), self.page)
+
+        self.cache.local.clear()
+        self.assertEqual(await self.cache.get(1, version, "list"), self.page)
+        self.assertEqual(await self.cache.get(1, version, "list"), self.page)
+        self.assertEqual(self.cache.stats(), {"local_hits": 2, "redis_hits": 1, "misses": 1})
+
+    async def test_bump_invalidates_only_that_user(self):
+        mine, theirs = await self.cache.version(1), await self.cache.version(2)
+        await self.cache.set(1, mine, "list", self.page)
+        await self.cache.set(2, theirs, "list", self.page)
+        await self.cache.bump(1)
+        self.assertNotEqual(await self.cache.version(1), mine)
+        self.assertIsNone(await self.cache.get(1, await self.cache.version(1), "list"))
+        self.assertEqual(await self.cache.get(2, await self.cache.version(2), "list"), self.page)
+
+    async def test_bypassed_without_redis(self):
+        self.cache.redis = AsyncMock(get=AsyncMock(side_effect=ConnectionError("down")))
+        version = await self.cache.version(1)
+        self.assertIsNone(version)
+        await self.cache.set(1, version, "list", self.page)
+        self.assertIsNone(await self.cache.get(1, version, "list"))
+
+
+    async def test_versions_expire_and_failed_bumps_drop_the_version(self):
+        version = await self.cache.version(1)
+        self.assertTrue(0 < await self.cache.redis.ttl("contacts:1:version") <= 60)
+
+        redis = self.cache.redis
+        self.cache.redis = AsyncMock(set=AsyncMock(side_effect=ConnectionError("blip")), delete=redis.delete)
+        with self.assertLogs("cache", "WARNING"):
+            await self.cache.bump(1)
+        self.cache.redis = redis
+        self.assertNotEqual(await self.cache.version(1), version)
+
+        self.cache.redis = AsyncMock(set=AsyncMock(side_effect=ConnectionError("down")),
+                                     delete=AsyncMock(side_effect=ConnectionError("down")))
+        with self.assertLogs("cache", "ERROR"):
+            await self.cache.bump(1)
+
+    async def test_unresponsive_redis_is_bypassed_after_the_timeout(self):
+        async def accept_and_hang(reader, writer):
+            await reader.read()
+
+        server = await asyncio.start_server(accept_and_hang, "127.0.0.1", 0)
+        hanging = redis.Redis(host="127.0.0.1", port=server.sockets[0].getsockname()[1],
+                              socket_timeout=0.1, socket_connect_timeout=0.1)
+        self.cache.redis = hanging
+        try:
+            async with asyncio.timeout(5):
+                self.assertIsNone(await self.cache.version(1))
+                with self.assertLogs("cache", "ERROR"):
+                    await self.cache.bump(1)
+        finally:
+            await hanging.aclose()
+            server.close()
+
+    def test_request_path_client_has_short_timeouts(self):
+        options = cache.cache_redis_client.connection_pool.connection_kwargs
+        self.assertEqual(options["socket_timeout"], cache.settings.redis_cache_timeout)
+        self.assertEqual(options["socket_connect_timeout"], cache.settings.redis_cache_timeout)
+
+def test_contact_reads_are_cached_until_a_write(client, auth_headers, metrics_headers, query_counter):
+    response = client.post("/api/contacts/", headers=auth_headers,
+                           json={"first_name": "Cached", "last_name": "Doe"})
+    assert response.status_code == 200, response.text
+    contact_id = response.json()["id"]
+
+    first = client.get("/api/contacts/", headers=auth_headers, params={"limit": 1})
+    client.get(f"/api/contacts/{contact_id}", headers=auth_headers)
+    with query_counter.budget(0):
+        second = client.get("/api/contacts/", headers=auth_headers, params={"limit": 1})
+        single = client.get(f"/api/contacts/{contact_id}", headers=auth_headers)
+    assert second.content == first.content
+    assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+    assert single.json()["first_name"] == "Cached"
+
+    client.put(f"/api/contacts/{contact_id}", headers=auth_headers, json={"first_name": "Fresh", "last_name": "Doe"})
+    assert client.get(f"/api/contacts/{contact_id}", headers=auth_headers).json()["first_name"] == "Fresh"
+    assert client.get("/api/contacts/", headers=auth_headers).json()[0]["first_name"] == "Fresh"
+
+    stats = client.get("/internal/metrics", headers=metrics_headers).json()["contact_cache"]
+    assert stats["local_hits"] >= 2 and stats["misses"] >= 3
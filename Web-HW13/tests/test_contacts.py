@@ -0,0 +1,17 @@
+def test_phone_number_is_stored_as_a_number(client, auth_headers):
+    response = client.post("/api/contacts/", headers=auth_headers,
+                           json={"first_name": "Phone", "last_name": "Doe", "phone_number": "0501112233"})
+    assert response.status_code == 200, response.text
+    contact = response.json()
+    assert contact["phone_number"] == "501112233"
+
+    response = client.put(f"/api/contacts/{contact['id']}", headers=auth_headers,
+                          json={"first_name": "Phone", "last_name": "Doe", "phone_number": "12345"})
+    assert response.status_code == 200, response.text
+    assert response.json()["phone_number"] == "12345"
+
+    for body in ({"first_name": "Bad", "last_name": "Phone", "phone_number": "abc"},
+                 {"first_name": "Bad", "last_name": "Phone", "phone_number": "+380 50"}):
+        assert client.post("/api/contacts/", headers=auth_headers, json=body).status_code == 422
+        assert client.put(f"/api/contacts/{contact['id']}", headers=auth_headers, json=body).status_code == 422
+    assert client.get(f"/api/contacts/{contact['id']}", headers=auth_headers).json()["phone_number"] == "12345"
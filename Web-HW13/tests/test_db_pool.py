@@ -0,0 +1,35 @@
+import unittest
+
+from sqlalchemy import exc
+
+from db import MeteredQueuePool, build_engine, pool_status
+
+
+class TestPoolMetrics(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = build_engine("sqlite+aiosqlite:///./test_pool.db", poolclass=MeteredQueuePool,
+                                   pool_size=2, max_overflow=1, pool_timeout=0.1)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_gauges_track_checkouts(self):
+        connections = [await self.engine.connect() for _ in range(3)]
+        status = pool_status(self.engine)
+        self.assertEqual(status["checked_out"], 3)
+        self.assertEqual(status["overflow"], 1)
+        for connection in connections:
+            await connection.close()
+        status = pool_status(self.engine)
+        self.assertEqual(status["checked_out"], 0)
+        self.assertEqual(status["checkouts"], 3)
+
+    async def test_timeout_is_counted(self):
+        connections = [await self.engine.connect() for _ in range(3)]
+        with self.assertRaises(exc.TimeoutError):
+            await self.engine.connect()
+        status = pool_status(self.engine)
+        self.assertEqual(status["timeouts"], 1)
+        self.assertGreaterEqual(status["wait_max_ms"], 100)
+        for connection in connections:
+            await connection.close()
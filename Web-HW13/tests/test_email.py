@@ -0,0 +1,135 @@
+import asyncio
+import socket
+import unittest
+from email.message import EmailMessage
+
+from aiosmtpd.controller import Controller
+from jinja2 import Environment
+
+from my_email import CachedTemplate, EmailDispatcher, build_verification_emails, verification_template
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class RecordingHandler:
+    """aiosmtpd handler that stores delivered messages and can reject the first few."""
+
+    def __init__(self, reject=0, reply="451 Try again later"):
+        self.reject = reject
+        self.reply = reply
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.reject:
+            self.reject -= 1
+            return self.reply
+        self.messages.append(envelope.content)
+        self.sessions.add(id(session))
+        return "250 OK"
+
+
+def make_message(number: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "app@example.com"
+    message["To"] = f"user{number}@example.com"
+    message["Subject"] = f"Message {number}"
+    message.set_content("Hello")
+    return message
+
+
+class TestEmailDispatcher(unittest.IsolatedAsyncioTestCase):
+    def start_server(self, handler):
+        port = free_port()
+        controller = Controller(handler, hostname="127.0.0.1", port=port)
+        controller.start()
+        self.addCleanup(controller.stop)
+        return {"hostname": "127.0.0.1", "port": port}
+
+    async def test_reuses_pooled_connections(self):
+        handler = RecordingHandler()
+        dispatcher = EmailDispatcher(self.start_server(handler), pool_size=2, batch_size=10, backoff=0)
+        for number in range(50):
+            await dispatcher.send(make_message(number))
+        await dispatcher.stop()
+        self.assertEqual(len(handler.messages), 50)
+        self.assertEqual(dispatcher.sent, 50)
+        self.assertLessEqual(dispatcher.connections, 2)
+
+    async def test_retries_temporary_failures(self):
+        handler = RecordingHandler(reject=2)
+        dispatcher = EmailDispatcher(self.start_server(handler), pool_size=1, max_retries=3, backoff=0)
+        await dispatcher.send(make_message(1))
+        await dispatcher.stop()
+        self.assertEqual(len(handler.messages), 1)
+        self.assertEqual((dispatcher.sent, dispatcher.failed), (1, 0))
+
+    async def test_drops_permanent_failures(self):
+        handler = RecordingHandler(reject=1, reply="550 Mailbox unavailable")
+        dispatcher = EmailDispatcher(self.start_server(handler), pool_size=1, max_retries=3, backoff=0)
+        with self.assertLogs("my_email", "WARNING"):
+            rejected = await dispatcher.send(make_message(1))
+            await dispatcher.send(make_message(2))
+            await dispatcher.stop()
+        self.assertFalse(await rejected)
+        self.assertEqual(len(handler.messages), 1)
+        self.assertEqual((dispatcher.sent, dispatcher.failed), (1, 1))
+
+    async def test_unexpected_errors_drop_only_their_message(self):
+        handler = RecordingHandler()
+        dispatcher = EmailDispatcher(self.start_server(handler), pool_size=1, batch_size=10, backoff=0)
+        deliver = dispatcher._deliver
+
+        async def fail_first(smtp, message):
+            if message["To"] == "user1@example.com":
+                raise RuntimeError("bug")
+            return await deliver(smtp, message)
+
+        dispatcher._deliver = fail_first
+        with self.assertLogs("my_email", "ERROR"):
+            results = [await dispatcher.send(make_message(number)) for number in range(1, 4)]
+            self.assertEqual(await asyncio.wait_for(asyncio.gather(*results), 5), [False, True, True])
+        self.assertEqual(await asyncio.wait_for(await dispatcher.send(make_message(4)), 5), True)
+        await dispatcher.stop()
+        self.assertEqual((dispatcher.sent, dispatcher.failed), (3, 1))
+
+    async def test_stop_resolves_unsent_messages(self):
+        dispatcher = EmailDispatcher({"hostname": "127.0.0.1", "port": free_port()}, pool_size=1,
+                                     batch_size=1, max_retries=100, backoff=60)
+        results = [await dispatcher.send(make_message(number)) for number in range(3)]
+        await dispatcher.stop(timeout=0.1)
+        self.assertEqual([result.result() for result in results], [False, False, False])
+
+    async def test_gives_up_when_server_is_down(self):
+        dispatcher = EmailDispatcher({"hostname": "127.0.0.1", "port": free_port()}, pool_size=1,
+                                     max_retries=2, backoff=0)
+        await dispatcher.send(make_message(1))
+        await dispatcher.stop()
+        self.assertEqual((dispatcher.sent, dispatcher.failed), (0, 1))
+
+
+def test_cached_template_matches_jinja():
+    context = {"host": "http://localhost/", "username": "Bob <admin>", "token": "abc"}
+    assert verification_template.parts is not None
+    assert verification_template.render(**context) == verification_template.template.render(context)
+
+    env = Environment(autoescape=True)
+    template = CachedTemplate(env.from_string("<p>{{ name }}</p>"), ("name",))
+    assert template.render_many([{"name": "<b>"}, {"name": "Ann"}]) == ["<p>&lt;b&gt;</p>", "<p>Ann</p>"]
+
+
+def test_cached_template_falls_back_for_logic():
+    template = CachedTemplate(Environment().from_string("{% if name %}{{ name|upper }}{% endif %}!"), ("name",))
+    assert template.parts is None
+    assert template.render_many([{"name": "ann"}, {}]) == ["ANN!", "!"]
+
+
+def test_build_verification_emails():
+    messages = build_verification_emails([("a@example.com", "Ann"), ("b@example.com", "Ben")], "http://localhost/")
+    assert [message["To"] for message in messages] == ["a@example.com", "b@example.com"]
+    assert "Hi Ben," in messages[1].get_content()
+    assert "http://localhost/api/auth/confirmed_email/" in messages[0].get_content()
@@ -0,0 +1,67 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+from sqlalchemy import select
+
+from cache import contact_cache
+from models import User
+
+
+def test_contact_list_and_item_etags(client, auth_headers, query_counter):
+    contact_id = client.post("/api/contacts/", headers=auth_headers,
+                             json={"first_name": "Tag", "last_name": "Doe"}).json()["id"]
+
+    listing = client.get("/api/contacts/", headers=auth_headers)
+    item = client.get(f"/api/contacts/{contact_id}", headers=auth_headers)
+    assert listing.headers["ETag"].startswith('"') and item.headers["ETag"] != listing.headers["ETag"]
+
+    with query_counter.budget(0):
+        response = client.get("/api/contacts/", headers={**auth_headers, "If-None-Match": listing.headers["ETag"]})
+        assert response.status_code == 304 and response.content == b""
+        response = client.get(f"/api/contacts/{contact_id}",
+                              headers={**auth_headers, "If-None-Match": item.headers["ETag"]})
+        assert response.status_code == 304
+
+    client.put(f"/api/contacts/{contact_id}", headers=auth_headers, json={"first_name": "Changed", "last_name": "Doe"})
+    response = client.get("/api/contacts/", headers={**auth_headers, "If-None-Match": listing.headers["ETag"]})
+    assert response.status_code == 200 and response.headers["ETag"] != listing.headers["ETag"]
+
+
+def test_row_version_etags_without_redis(client, auth_headers, monkeypatch):
+    contact_id = client.post("/api/contacts/", headers=auth_headers,
+                             json={"first_name": "Row", "last_name": "Doe"}).json()["id"]
+    monkeypatch.setattr(contact_cache, "version", AsyncMock(return_value=None))
+
+    item = client.get(f"/api/contacts/{contact_id}", headers=auth_headers)
+    assert item.headers["ETag"].startswith('"r')
+    response = client.get(f"/api/contacts/{contact_id}", headers={**auth_headers, "If-None-Match": item.headers["ETag"]})
+    assert response.status_code == 304
+
+    client.put(f"/api/contacts/{contact_id}", headers=auth_headers, json={"first_name": "Row2", "last_name": "Doe"})
+    response = client.get(f"/api/contacts/{contact_id}", headers={**auth_headers, "If-None-Match": item.headers["ETag"]})
+    assert response.status_code == 200 and response.json()["first_name"] == "Row2"
+
+
+def test_me_etag_follows_user_version(client, auth_headers, session_factory):
+    me = client.get("/api/contacts/me/", headers=auth_headers)
+    etag = me.headers["ETag"]
+    assert client.get("/api/contacts/me/", headers={**auth_headers, "If-None-Match": f"W/{etag}"}).status_code == 304
+
+    async def touch():
+        async with session_factory() as db:
+            user = await db.scalar(select(User).where(User.email == "owner@example.com"))
+            version = user.version
+            user.avatar = "https://example.com/new.png"
+            await db.commit()
+            return version, user.version
+
+    before, after = asyncio.run(touch())
+    assert after == before + 1
+
+    # The write bypassed the process's user cache, as one from another worker would.
+    fresh = client.get("/api/contacts/me/", headers=auth_headers)
+    assert fresh.status_code == 200 and fresh.headers["ETag"] != etag
+    assert fresh.json()["avatar"] == "https://example.com/new.png"
+    assert client.get("/api/contacts/me/", headers={**auth_headers, "If-None-Match": etag}).status_code == 200
+    assert client.get("/api/contacts/me/",
+                      headers={**auth_headers, "If-None-Match": fresh.headers["ETag"]}).status_code == 304
@@ -0,0 +1,84 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool
+
+from contacts_io import EXPORT_FIELDS, export_contacts
+from models import Base, Contacts, User
+from db import build_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+EXPORT_RSS_ROWS = int(os.environ.get("EXPORT_RSS_ROWS", 1_000_000))
+
+
+def current_rss() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+@pytest.fixture(scope="module")
+def exported(client, auth_headers, session_factory):
+    async def seed():
+        async with session_factory() as db:
+            owner = await db.scalar(text("SELECT id FROM users WHERE email = 'owner@example.com'"))
+            db.add_all([
+                Contacts(first_name="John", last_name="Doe", email="john@example.com", phone_number=380501112233,
+                         born_date=date(1990, 4, 15), user_id=owner),
+                Contacts(first_name="Ann", last_name="Lee, Jr.", user_id=owner),
+            ])
+            await db.commit()
+
+    asyncio.run(seed())
+
+
+def test_export_ndjson(client, auth_headers, exported):
+    response = client.get("/api/contacts/export", headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["first_name"] for row in rows] == ["John", "Ann"]
+    assert rows[0]["born_date"] == "1990-04-15"
+    assert set(rows[0]) == set(EXPORT_FIELDS)
+
+
+def test_export_csv(client, auth_headers, exported):
+    response = client.get("/api/contacts/export?format=csv", headers=auth_headers)
+    assert response.status_code == 200, response.text
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["last_name"] for row in rows] == ["Doe", "Lee, Jr."]
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="needs /proc to sample RSS")
+def test_export_memory_is_constant(tmp_path):
+    engine = build_engine(f"sqlite+aiosqlite:///{tmp_path}/export.db", poolclass=NullPool)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(text("INSERT INTO users (id, username, email, password) VALUES (1, 'big', 'big@x', 'x')"))
+            await conn.execute(text(
+                "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < :rows) "
+                "INSERT INTO contacts (first_name, last_name, email, phone_number, user_id) "
+                "SELECT 'first' || n, 'last' || n, 'c' || n || '@example.com', 380500000000 + n, 1 FROM seq"
+            ), {"rows": EXPORT_RSS_ROWS})
+        exported_rows, exported_bytes, peak = 0, 0, 0
+        baseline = current_rss()
+        async for chunk in export_contacts(session_factory, User(id=1), "ndjson"):
+            exported_rows += chunk.count(b"\n")
+            exported_bytes += len(chunk)
+            peak = max(peak, current_rss() - baseline)
+        await engine.dispose()
+        return exported_rows, exported_bytes, peak
+
+    exported_rows, exported_bytes, peak = asyncio.run(run())
+    assert exported_rows == EXPORT_RSS_ROWS
+    # The export is ~100 MB for 1M rows; materializing it would grow RSS by far more than this.
+    assert peak < 32 * 1024 * 1024, f"RSS grew by {peak / 2**20:.1f} MB while exporting {exported_bytes / 2**20:.0f} MB"
@@ -0,0 +1,97 @@
+import io
+
+from sqlalchemy.exc import DBAPIError
+
+import repository
+from contacts_io import detect_format, iter_contact_batches
+
+CSV = (
+    "first_name,last_name,email,phone_number,born_date\n"
+    "John,Doe,john@example.com,380501112233,1990-04-15\n"
+    "Jane,,jane@example.com,,\n"
+    "Max,Payne,,not-a-number,\n"
+    "Ann,Lee,,,2001-02-03\n"
+)
+
+NDJSON = (
+    '{"first_name": "John", "last_name": "Doe"}\n'
+    '\n'
+    'not json\n'
+    '["a", "list"]\n'
+    '{"first_name": "Ann", "last_name": "Lee", "born_date": "2001-02-03"}\n'
+)
+
+
+def test_detect_format():
+    assert detect_format("book.CSV", None) == "csv"
+    assert detect_format("book.jsonl", None) == "ndjson"
+    assert detect_format(None, "application/x-ndjson") == "ndjson"
+    assert detect_format("book.txt", "text/plain") is None
+
+
+def test_csv_batches_and_errors():
+    batches = list(iter_contact_batches(io.BytesIO(CSV.encode()), "csv", batch_size=2))
+    assert len(batches) == 2
+    rows = [row for batch_rows, _ in batches for row in batch_rows]
+    errors = [error for _, batch_errors in batches for error in batch_errors]
+    assert [(line, row["first_name"]) for line, row in rows] == [(2, "John"), (5, "Ann")]
+    assert rows[0][1]["phone_number"] == 380501112233
+    assert [line for line, _ in errors] == [3, 4]
+    assert "last_name" in errors[0][1]
+
+
+def test_ndjson_errors():
+    batches = list(iter_contact_batches(io.BytesIO(NDJSON.encode()), "ndjson", batch_size=100))
+    rows, errors = batches[0]
+    assert [line for line, _ in rows] == [1, 5]
+    assert [line for line, _ in errors] == [3, 4]
+
+
+def test_import_endpoint(client, auth_headers):
+    response = client.post("/api/contacts/import", headers=auth_headers,
+                           files={"file": ("book.csv", CSV.encode(), "text/csv")})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["imported"] == 2
+    assert data["failed"] == 2
+    assert [error["line"] for error in data["errors"]] == [3, 4]
+
+    response = client.get("/api/contacts/", headers=auth_headers)
+    assert [contact["first_name"] for contact in response.json()] == ["John", "Ann"]
+
+
+def test_import_rejects_unknown_format(client, auth_headers):
+    response = client.post("/api/contacts/import", headers=auth_headers,
+                           files={"file": ("book.txt", b"hello", "text/plain")})
+    assert response.status_code == 415
+
+
+def test_out_of_range_phone_numbers_are_row_errors(client, auth_headers):
+    csv_file = ("first_name,last_name,phone_number\n"
+                f"Huge,Number,{10 ** 20}\n"
+                "Negative,Number,-1\n"
+                "Fits,Number,380501112233\n")
+    response = client.post("/api/contacts/import", headers=auth_headers,
+                           files={"file": ("book.csv", csv_file.encode(), "text/csv")})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert (data["imported"], data["failed"]) == (1, 2)
+    assert [error["line"] for error in data["errors"]] == [2, 3]
+    assert all("phone_number" in error["error"] for error in data["errors"])
+
+
+def test_rejected_batch_is_retried_row_by_row(client, auth_headers, monkeypatch):
+    import_contacts = repository.import_contacts
+
+    async def refuse_bad_rows(rows, db, current_user):
+        if any(row["first_name"] == "Bad" for row in rows):
+            raise DBAPIError("INSERT INTO contacts", {}, ValueError("value too long"))
+        return await import_contacts(rows, db, current_user)
+
+    monkeypatch.setattr(repository, "import_contacts", refuse_bad_rows)
+    csv_file = "first_name,last_name\nGood,One\nBad,Row\nGood,Two\n"
+    response = client.post("/api/contacts/import", headers=auth_headers,
+                           files={"file": ("book.csv", csv_file.encode(), "text/csv")})
+    data = response.json()
+    assert (data["imported"], data["failed"]) == (2, 1)
+    assert data["errors"] == [{"line": 3, "error": "Rejected by the database: value too long"}]
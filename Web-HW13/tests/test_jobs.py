@@ -0,0 +1,136 @@
+import asyncio
+import io
+import json
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+
+from fakeredis import FakeAsyncRedis
+from PIL import Image
+
+from config import settings
+import jobs
+from jobs import JobQueue, job_queue
+
+
+class TestJobQueue(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.queue = JobQueue(FakeAsyncRedis(), "test-jobs", max_retries=2, backoff=0)
+        self.calls = []
+
+    async def test_runs_queued_jobs(self):
+        @self.queue.job("greet")
+        async def greet(name):
+            self.calls.append(name)
+
+        await self.queue.enqueue("greet", name="Ann")
+        await self.queue.enqueue("greet", name="Ben")
+        self.assertEqual((await self.queue.depth())["queued"], 2)
+        await self.queue.work(burst=True, worker_id="w1")
+        self.assertEqual(sorted(self.calls), ["Ann", "Ben"])
+        self.assertEqual(await self.queue.depth(), {"queued": 0, "delayed": 0, "dead": 0})
+
+    async def test_retries_then_gives_up(self):
+        @self.queue.job("flaky")
+        async def flaky(fail_times):
+            self.calls.append(1)
+            if len(self.calls) <= fail_times:
+                raise RuntimeError("temporary")
+
+        await self.queue.enqueue("flaky", fail_times=2)
+        await self.queue.work(burst=True, worker_id="w1")
+        self.assertEqual(len(self.calls), 3)
+
+        self.calls.clear()
+        await self.queue.enqueue("flaky", fail_times=10)
+        await self.queue.enqueue("missing")
+        await self.queue.work(burst=True, worker_id="w1")
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual((await self.queue.depth())["dead"], 2)
+
+    async def test_malformed_jobs_are_dead_lettered(self):
+        for raw in (b"not json", json.dumps({"id": "2"}), json.dumps([1])):
+            await self.queue.redis.lpush(self.queue.queued_key, raw)
+        await self.queue.work(burst=True, worker_id="w1")
+        self.assertEqual(await self.queue.depth(), {"queued": 0, "delayed": 0, "dead": 3})
+        self.assertEqual(await self.queue.redis.llen(self.queue.processing_key("w1")), 0)
+
+    async def test_dead_job_releases_resources(self):
+        released = []
+
+        @self.queue.job("upload", on_dead=lambda path: released.append(path))
+        async def upload(path):
+            raise RuntimeError("storage down")
+
+        await self.queue.enqueue("upload", path="/tmp/staged.jpg")
+        await self.queue.work(burst=True, worker_id="w1")
+        self.assertEqual(released, ["/tmp/staged.jpg"])
+        self.assertEqual((await self.queue.depth())["dead"], 1)
+
+    async def test_limits_concurrency(self):
+        running, peak = 0, 0
+
+        @self.queue.job("slow")
+        async def slow():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        for _ in range(10):
+            await self.queue.enqueue("slow")
+        await self.queue.work(concurrency=3, burst=True, worker_id="w1")
+        self.assertEqual(peak, 3)
+
+    async def test_requeues_jobs_of_crashed_worker(self):
+        @self.queue.job("greet")
+        async def greet(name):
+            self.calls.append(name)
+
+        job = {"id": "1", "name": "greet", "kwargs": {"name": "Ann"}, "attempts": 0}
+        await self.queue.redis.lpush(self.queue.processing_key("w1"), json.dumps(job))
+        await self.queue.work(burst=True, worker_id="w1")
+        self.assertEqual(self.calls, ["Ann"])
+
+
+    async def test_undelivered_verification_email_is_not_retried(self):
+        async def dropped(recipients, host):
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(False)
+            return [future]
+
+        self.queue.job("send_verification_email")(jobs.send_verification_email)
+        await self.queue.enqueue("send_verification_email", email="a@example.com", username="a", host="h")
+        with patch.object(jobs, "send_emails", dropped):
+            await self.queue.work(burst=True, worker_id="w1")
+        self.assertEqual(await self.queue.depth(), {"queued": 0, "delayed": 0, "dead": 0})
+
+def test_routes_enqueue_jobs(client, auth_headers, metrics_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "upload_staging_dir", str(tmp_path))
+    response = client.post("/api/auth/signup", json={"username": "queued", "email": "queued@example.com",
+                                                     "password": "12345678"})
+    assert response.status_code == 201, response.text
+
+    png = io.BytesIO()
+    Image.new("RGB", (10, 10)).save(png, "PNG")
+    response = client.patch("/api/contacts/avatar", headers=auth_headers,
+                            files={"file": ("me.png", png.getvalue(), "image/png")})
+    assert response.status_code == 202, response.text
+    assert response.json()["job_id"]
+
+    jobs = [json.loads(raw) for raw in asyncio.run(job_queue.redis.lrange(job_queue.queued_key, 0, -1))]
+    assert [job["name"] for job in jobs] == ["update_avatar", "send_verification_email"]
+    assert Path(jobs[0]["kwargs"]["path"]).read_bytes() == png.getvalue()
+
+    response = client.get("/internal/metrics", headers=metrics_headers)
+    assert response.json()["jobs"] == {"queued": 2, "delayed": 0, "dead": 0}
+
+
+def test_metrics_require_the_metrics_token(client, auth_headers, metrics_headers, monkeypatch):
+    assert client.get("/internal/metrics").status_code == 401
+    assert client.get("/internal/metrics", headers=auth_headers).status_code == 401
+    assert client.get("/internal/metrics", headers=metrics_headers).status_code == 200
+
+    monkeypatch.setattr(settings, "metrics_token", "")
+    assert client.get("/internal/metrics", headers={"Authorization": "Bearer "}).status_code == 404
@@ -0,0 +1,69 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+
+from fakeredis import FakeAsyncRedis
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from auth import auth_service
+from limiter import RateLimiter, identify
+
+
+def make_request(token=None, host="10.0.0.1") -> Request:
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "method": "POST", "path": "/api/contacts/", "headers": headers,
+                    "client": (host, 1234)})
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+    async def test_identifies_users_and_clients(self):
+        token = await auth_service.create_access_token(data={"sub": "ann@example.com"})
+        self.assertEqual(identify(make_request(token)), "user:ann@example.com")
+        self.assertEqual(identify(make_request("garbage")), "ip:10.0.0.1")
+
+    async def test_local_bucket(self):
+        limiter = RateLimiter(times=3, seconds=60, name="test")
+        for _ in range(3):
+            await limiter(make_request())
+        with self.assertRaises(HTTPException) as ctx:
+            await limiter(make_request())
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertEqual(ctx.exception.headers["Retry-After"], "20")
+        await limiter(make_request(host="10.0.0.2"))
+
+    async def test_local_bucket_refills(self):
+        limiter = RateLimiter(times=2, seconds=0.1, name="test")
+        await limiter(make_request())
+        await limiter(make_request())
+        await asyncio.sleep(0.06)
+        await limiter(make_request())
+
+    async def test_global_limit_is_shared_between_workers(self):
+        redis = FakeAsyncRedis()
+        workers = [RateLimiter(times=4, seconds=60, name="test", redis_client=redis) for _ in range(2)]
+        for number in range(4):
+            await workers[number % 2](make_request())
+        for worker in workers:
+            with self.assertRaises(HTTPException):
+                await worker(make_request())
+
+    async def test_redis_failure_falls_back_to_local(self):
+        limiter = RateLimiter(times=1, seconds=60, name="test", redis_client=FakeAsyncRedis())
+        limiter._script = AsyncMock(side_effect=ConnectionError("down"))
+        await limiter(make_request())
+        with self.assertRaises(HTTPException):
+            await limiter(make_request())
+
+
+def test_create_contact_is_rate_limited(client, auth_headers):
+    statuses = [client.post("/api/contacts/", headers=auth_headers,
+                            json={"first_name": "Rate", "last_name": f"Limited{number}"}).status_code
+                for number in range(11)]
+    assert statuses == [200] * 10 + [429]
+
+
+def test_reads_are_rate_limited_per_route(client, auth_headers):
+    for path, times in (("/api/contacts/", 10), ("/api/contacts/search?q=doe", 10), ("/api/contacts/export", 5)):
+        statuses = [client.get(path, headers=auth_headers).status_code for _ in range(times + 1)]
+        assert statuses == [200] * times + [429], path
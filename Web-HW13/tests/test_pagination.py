@@ -0,0 +1,53 @@
+import base64
+import json
+import unittest
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import build_engine
+from models import Base, Contacts, User
+from repository import decode_cursor, encode_cursor, get_contacts
+
+
+class TestKeysetPagination(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = build_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session = AsyncSession(self.engine, expire_on_commit=False)
+        self.user = User(username="owner", email="owner@example.com", password="x")
+        self.session.add(self.user)
+        await self.session.flush()
+        self.session.add_all([
+            Contacts(id=1, first_name="Ann", last_name="Doe", user_id=self.user.id),
+            Contacts(id=2, first_name="Nameless", last_name=None, user_id=self.user.id),
+            Contacts(id=3, first_name="Bob", last_name="Adams", user_id=self.user.id),
+        ])
+        await self.session.commit()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    async def walk(self, sort, columns=None):
+        seen, cursor = [], None
+        while True:
+            page = await get_contacts(0, 1, self.session, self.user, cursor, sort, columns)
+            if not page:
+                return seen
+            seen.append(page[0].id)
+            cursor = decode_cursor(encode_cursor(page[0], sort), sort)
+
+    async def test_cursor_pages_include_null_last_name(self):
+        by_offset = [contact.id for contact in await get_contacts(0, 10, self.session, self.user, sort="last_name")]
+        self.assertEqual(by_offset, [2, 3, 1])
+        self.assertEqual(await self.walk("last_name"), by_offset)
+        self.assertEqual(await self.walk("last_name", ("id", "last_name")), by_offset)
+        self.assertEqual(await self.walk("id"), [1, 2, 3])
+
+
+def test_cursor_with_wrong_values_is_rejected(client, auth_headers):
+    for key, sort in (([{"a": 1}, 5], "last_name"), ([10 ** 30], "id"), (["Doe", 10 ** 30], "last_name")):
+        cursor = base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+        response = client.get("/api/contacts/", headers=auth_headers, params={"sort": sort, "cursor": cursor})
+        assert response.status_code == 400, response.text
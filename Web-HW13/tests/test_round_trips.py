@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+import repository
+from models import User
+from schemas import ContactModel, ContactResponse, UserModel
+
+# Statements each write path may send, COMMIT excluded. Contact writes add one upsert of the
+# user's contact stats; a rename also reads the old last name first.
+WRITE_BUDGETS = {
+    "create_user": 1,
+    "create_contact": 2,
+    "update_contact": 3,
+    "delete_contact": 2,
+    "signup": 1,
+}
+
+
+@pytest.fixture(scope="module")
+def owner(session_factory):
+    async def create():
+        async with session_factory() as db:
+            body = UserModel(username="writer", email="writer@example.com", password="secret123")
+            return await repository.create_user(body, db)
+
+    return asyncio.run(create())
+
+
+def test_write_paths_stay_within_budget(session_factory, query_counter, owner):
+    async def run():
+        async with session_factory() as db:
+            with query_counter.budget(WRITE_BUDGETS["create_user"]):
+                user = await repository.create_user(
+                    UserModel(username="budget", email="budget@example.com", password="secret123"), db)
+            assert user.id and user.created_at is not None
+
+            body = ContactModel(first_name="John", last_name="Doe", born_date="1990-04-15")
+            with query_counter.budget(WRITE_BUDGETS["create_contact"]):
+                contact = await repository.create_contact(body, db, owner)
+            assert (contact.user_id, contact.birthday_key) == (owner.id, 415)
+
+            contact_id = contact.id
+            body = ContactModel(first_name="Jack", last_name="Doe")
+            with query_counter.budget(WRITE_BUDGETS["update_contact"]):
+                contact = await repository.update_contact(contact_id, body, db, owner)
+            assert contact.first_name == "Jack"
+
+            with query_counter.budget(WRITE_BUDGETS["delete_contact"]):
+                contact = await repository.delete_contact(contact_id, db, owner)
+            assert contact.id == contact_id
+
+    asyncio.run(run())
+
+
+def test_writes_are_scoped_to_owner(session_factory, owner):
+    async def run():
+        async with session_factory() as db:
+            contact_id = (await repository.create_contact(ContactModel(first_name="Ann", last_name="Lee"), db, owner)).id
+            stranger = User(id=owner.id + 100)
+            body = ContactModel(first_name="Eve", last_name="Lee")
+            assert await repository.get_contact(contact_id, db, stranger) is None
+            assert await repository.update_contact(contact_id, body, db, stranger) is None
+            assert await repository.delete_contact(contact_id, db, stranger) is None
+            assert (await repository.get_contact(contact_id, db, owner)).first_name == "Ann"
+
+            # A client-supplied id, even one already taken, never reaches the INSERT.
+            copy = await repository.create_contact(ContactResponse(id=contact_id, first_name="Eve", last_name="Lee"),
+                                                   db, owner)
+            assert copy.id != contact_id and copy.first_name == "Eve"
+            assert (await repository.get_contact(contact_id, db, owner)).first_name == "Ann"
+
+    asyncio.run(run())
+
+
+def test_signup_is_a_single_insert(client, query_counter):
+    body = {"username": "fast", "email": "fast@example.com", "password": "12345678"}
+    with query_counter.budget(WRITE_BUDGETS["signup"]):
+        response = client.post("/api/auth/signup", json=body)
+    assert response.status_code == 201, response.text
+    assert response.json()["user"]["avatar"].startswith("https://www.gravatar.com/avatar/")
+    assert client.post("/api/auth/signup", json=body).status_code == 409
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import routes
 from models import User
@@ -7,10 +7,11 @@ from auth import auth_service
 
 
 def test_create_suer(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("routes.send_email", mock_send_email)
+    mock_enqueue = AsyncMock()
+    monkeypatch.setattr("routes.job_queue.enqueue", mock_enqueue)
     response = client.post("/api/auth/signup", json=user)
     assert response.status_code == 201, response.text
+    assert mock_enqueue.await_args.args == ("send_verification_email",)
     data = response.json()
     assert data['user']['email'] == user.get('email')
     assert 'id' in data['user']
@@ -0,0 +1,50 @@
+import unittest
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import build_engine
+from models import Base, Contacts, User
+from repository import search_contacts
+
+
+class TestSearchContacts(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = build_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session = AsyncSession(self.engine, expire_on_commit=False)
+        self.user = User(username="owner", email="owner@example.com", password="x")
+        self.other = User(username="other", email="other@example.com", password="x")
+        self.session.add_all([self.user, self.other])
+        await self.session.flush()
+        self.session.add_all([
+            Contacts(first_name="John", last_name="Doe", email="john@example.com", phone_number=380501112233,
+                     user_id=self.user.id),
+            Contacts(first_name="Jane", last_name="Doerty", email="jane@mail.org", phone_number=380679998877,
+                     user_id=self.user.id),
+            Contacts(first_name="Max", last_name="Payne", email="max_100%@example.com", user_id=self.user.id),
+            Contacts(first_name="John", last_name="Doe", email="john@example.com", user_id=self.other.id),
+        ])
+        await self.session.commit()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    async def search(self, query, limit=20, cursor=None):
+        return [contact.first_name for contact in
+                await search_contacts(query, limit, self.session, self.user, cursor)]
+
+    async def test_matches_any_field_case_insensitively(self):
+        self.assertEqual(await self.search("doe"), ["John", "Jane"])
+        self.assertEqual(await self.search("MAIL.ORG"), ["Jane"])
+        self.assertEqual(await self.search("38067"), ["Jane"])
+
+    async def test_wildcards_are_literal(self):
+        self.assertEqual(await self.search("100%"), ["Max"])
+        self.assertEqual(await self.search("%"), ["Max"])
+
+    async def test_cursor_pagination(self):
+        first = await search_contacts("o", 1, self.session, self.user)
+        second = await search_contacts("o", 1, self.session, self.user, [first[0].id])
+        self.assertEqual([first[0].first_name, second[0].first_name], ["John", "Jane"])
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import unittest
+from datetime import date
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from contacts_io import dump_contact, dump_contacts
+from db import build_engine
+from models import Base, Contacts, User
+from repository import CONTACT_FIELDS, get_contact, get_contacts
+from schemas import ContactResponse
+
+
+class TestRowSerialization(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = build_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session = AsyncSession(self.engine, expire_on_commit=False)
+        self.user = User(username="owner", email="owner@example.com", password="x")
+        self.session.add(self.user)
+        await self.session.flush()
+        self.session.add_all([
+            Contacts(first_name="John", last_name="Doe", email="john@example.com", phone_number=380501112233,
+                     born_date=date(1990, 4, 15), another_info="Ünïcode \"quoted\"", user_id=self.user.id),
+            Contacts(first_name="Jane", last_name="Roe", user_id=self.user.id),
+        ])
+        await self.session.commit()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    async def test_rows_encode_like_the_response_model(self):
+        contacts = await get_contacts(0, 10, self.session, self.user)
+        expected = TypeAdapter(List[ContactResponse]).dump_json(
+            TypeAdapter(List[ContactResponse]).validate_python(contacts, from_attributes=True))
+
+        rows = await get_contacts(0, 10, self.session, self.user, columns=(*CONTACT_FIELDS, "version"))
+        self.assertEqual(json.loads(dump_contacts(rows)), json.loads(expected))
+        self.assertEqual(json.loads(dump_contacts(rows))[0]["phone_number"], "380501112233")
+
+    async def test_single_row(self):
+        row = await get_contact(1, self.session, self.user, CONTACT_FIELDS)
+        self.assertEqual(json.loads(dump_contact(row)),
+                         ContactResponse.model_validate(await get_contact(1, self.session, self.user),
+                                                        from_attributes=True).model_dump(mode="json"))
+        self.assertIsNone(await get_contact(99, self.session, self.user, CONTACT_FIELDS))
+
+    async def test_projection_selects_only_requested_columns(self):
+        self.session.expunge_all()
+        rows = await get_contacts(0, 10, self.session, self.user, columns=("last_name", "id"))
+        self.assertEqual([tuple(row) for row in rows], [("Doe", 1), ("Roe", 2)])
+        self.assertEqual(list(self.session.identity_map), [])
+        self.assertEqual(json.loads(dump_contacts(rows, ("last_name",))), [{"last_name": "Doe"}, {"last_name": "Roe"}])
+
+
+def test_list_fields_projection(client, auth_headers, session_factory):
+    async def seed():
+        async with session_factory() as db:
+            owner = await db.scalar(select(User).filter_by(email="owner@example.com"))
+            db.add_all(Contacts(id=7001 + number, first_name=f"Field{number}", last_name="Projected",
+                                another_info="long notes", user_id=owner.id) for number in range(3))
+            await db.commit()
+
+    asyncio.run(seed())
+
+    response = client.get("/api/contacts/", headers=auth_headers,
+                          params={"limit": 2, "sort": "last_name", "fields": "last_name, first_name"})
+    assert response.status_code == 200
+    assert response.json() == [{"first_name": "Field0", "last_name": "Projected"},
+                               {"first_name": "Field1", "last_name": "Projected"}]
+    response = client.get("/api/contacts/", headers=auth_headers,
+                          params={"limit": 2, "sort": "last_name", "fields": "first_name",
+                                  "cursor": response.headers["X-Next-Cursor"]})
+    assert response.json() == [{"first_name": "Field2"}]
+
+    response = client.get("/api/contacts/search", headers=auth_headers, params={"q": "field", "fields": "id"})
+    assert response.json() == [{"id": 7001}, {"id": 7002}, {"id": 7003}]
+
+    response = client.get("/api/contacts/", headers=auth_headers, params={"fields": "id,user_id"})
+    assert response.status_code == 400 and response.json()["detail"] == "Unknown fields: user_id"
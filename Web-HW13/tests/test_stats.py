@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+from collections import Counter
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import repository
+from db import build_engine
+from models import Base, Contacts, User, contact_letter
+from schemas import ContactModel
+
+
+class TestContactStats(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = build_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session = AsyncSession(self.engine, expire_on_commit=False)
+        self.user = User(username="owner", email="owner@example.com", password="x")
+        self.other = User(username="other", email="other@example.com", password="x")
+        self.session.add_all([self.user, self.other])
+        await self.session.commit()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    async def recount(self, user):
+        names = await self.session.scalars(select(Contacts.last_name).filter(Contacts.user_id == user.id))
+        letters = Counter(map(contact_letter, names))
+        return {"total": sum(letters.values()), "letters": dict(sorted(letters.items()))}
+
+    async def assert_stats(self, expected_letters):
+        stats = await repository.get_contact_stats(self.session, self.user)
+        self.assertEqual(stats["letters"], expected_letters)
+        self.assertEqual(stats, await self.recount(self.user))
+
+    def test_letters(self):
+        self.assertEqual([contact_letter(name) for name in ("doe", "Émile", "Ярош", "1st", "", None)],
+                         ["D", "É", "Я", "#", "#", "#"])
+
+    async def test_every_write_path_keeps_counts(self):
+        async def create(last_name, user=self.user):
+            contact = await repository.create_contact(ContactModel(first_name="A", last_name=last_name),
+                                                      self.session, user)
+            return contact.id
+
+        doe, dane, roe = [await create(last_name) for last_name in ("Doe", "dane", "Roe")]
+        theirs = await create("Doe", self.other)
+        await self.assert_stats({"D": 2, "R": 1})
+
+        await repository.import_contacts([{"first_name": "B", "last_name": "007"},
+                                          {"first_name": "B", "last_name": "Ray"}], self.session, self.user)
+        await self.assert_stats({"#": 1, "D": 2, "R": 2})
+        digits = await self.session.scalar(select(Contacts.id).filter_by(user_id=self.user.id, last_name="007"))
+
+        await repository.update_contact(doe, ContactModel(first_name="A", last_name="Adams"), self.session, self.user)
+        await repository.update_contact(roe, ContactModel(first_name="Renamed", last_name="Roe"),
+                                        self.session, self.user)
+        self.assertIsNone(await repository.update_contact(theirs, ContactModel(first_name="A", last_name="Zed"),
+                                                          self.session, self.user))
+        await self.assert_stats({"#": 1, "A": 1, "D": 1, "R": 2})
+
+        await repository.update_contacts([([dane, roe, theirs], {"last_name": "Smith"}),
+                                          ([digits], {"first_name": "C"})], self.session, self.user)
+        await self.assert_stats({"#": 1, "A": 1, "R": 1, "S": 2})
+
+        await repository.delete_contact(doe, self.session, self.user)
+        await repository.delete_contacts([dane, digits, theirs], self.session, self.user)
+        await self.assert_stats({"R": 1, "S": 1})
+        self.assertEqual(await repository.get_contact_stats(self.session, self.other),
+                         {"total": 1, "letters": {"D": 1}})
+
+def test_stats_route(client, auth_headers, session_factory):
+    async def seed():
+        async with session_factory() as db:
+            owner = await db.scalar(select(User).filter_by(email="owner@example.com"))
+            for last_name in ("Stat", "stone", "Bloggs"):
+                await repository.create_contact(ContactModel(first_name="Count", last_name=last_name), db, owner)
+
+    asyncio.run(seed())
+    response = client.get("/api/contacts/stats", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"total": 3, "letters": {"B": 1, "S": 2}}
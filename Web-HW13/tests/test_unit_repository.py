@@ -1,77 +1,116 @@
+import base64
+import json
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
-from sqlalchemy import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from models import User, Contacts
-from schemas import ContactResponse, ContactBase
+from schemas import ContactModel, ContactBase
 from repository import (
     get_contacts,
     get_contact,
     create_contact,
     update_contact,
     delete_contact,
+    encode_cursor,
+    decode_cursor,
 )
 
 class TestContacts(unittest.IsolatedAsyncioTestCase):
-    def SetUp(self):
-        self.session = MagicMock(spec=Session)
+    def setUp(self):
+        self.session = AsyncMock(spec=AsyncSession)
+        self.session.add = MagicMock()
+        self.session.get_bind.return_value.dialect.name = "sqlite"
         self.user = User(id=1)
 
     async def test_get_contacts(self):
         contacts = [Contacts(), Contacts(), Contacts()]
-        self.session.query().offset().limit().all.return_value = contacts
-        result = await get_contacts(skip=0, limit=10, db=self.session)
+        self.session.scalars.return_value.all = MagicMock(return_value=contacts)
+        result = await get_contacts(skip=0, limit=10, db=self.session, current_user=self.user)
         self.assertEqual(result, contacts)
 
+    async def test_get_contacts_with_cursor(self):
+        contacts = [Contacts(id=11), Contacts(id=12)]
+        self.session.scalars.return_value.all = MagicMock(return_value=contacts)
+        result = await get_contacts(skip=500, limit=2, db=self.session, current_user=self.user, cursor=[10])
+        self.assertEqual(result, contacts)
+        stmt = self.session.scalars.call_args.args[0]
+        self.assertNotIn("OFFSET", str(stmt))
+        self.assertIn("contacts.id >", str(stmt))
+
+    def test_cursor_roundtrip(self):
+        contact = Contacts(id=42, last_name="Doe")
+        self.assertEqual(decode_cursor(encode_cursor(contact)), [42])
+        self.assertEqual(decode_cursor(encode_cursor(contact, "last_name"), "last_name"), ["Doe", 42])
+
+    def test_cursor_invalid(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+        with self.assertRaises(ValueError):
+            decode_cursor(encode_cursor(Contacts(id=1)), "last_name")
+        for key, sort in (([{"a": 1}, 5], "last_name"), (["Doe", "5"], "last_name"), ([True], "id"),
+                          ([None, 5], "last_name"), ([10 ** 30], "id"), (["Doe", 2 ** 63], "last_name"),
+                          ([0], "id"), ([-5], "id")):
+            cursor = base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor, sort)
+
     async def test_get_contact_found(self):
         contact = Contacts()
-        self.session.query().filter().first.return_value = contact
-        result = await get_contact(contact_id=1, db=self.session)
+        self.session.scalar.return_value = contact
+        result = await get_contact(contact_id=1, db=self.session, current_user=self.user)
         self.assertEqual(result, contact)
+        self.assertIn("contacts.user_id =", str(self.session.scalar.call_args.args[0]))
 
     async def test_get_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
-        result = await get_contact(contact_id=1, db=self.session)
+        self.session.scalar.return_value = None
+        result = await get_contact(contact_id=1, db=self.session, current_user=self.user)
         self.assertIsNone(result)
 
     async def test_create_contact(self):
-        body = ContactResponse(first_name="TestName", last_name="TestSurname", id=1000, email="test@email", phone_number="00000000")
-        expected_result = Contacts(**body.dict())
-        result = await create_contact(body, db=self.session)
-        self.assertEqual(result.first_name, body.first_name)
-        self.assertEqual(result.last_name, body.last_name)
-        self.assertEqual(result.id, body.id)
-        self.assertEqual(result.email, body.email)
-        self.assertEqual(result.phone_number, body.phone_number)
-        self.assertTrue(hasattr(result, "id"))
+        body = ContactModel(first_name="TestName", last_name="TestSurname", email="test@email", phone_number=5551234, another_info=None)
+        contact = Contacts(id=1000, first_name="TestName", user_id=self.user.id)
+        self.session.scalar.return_value = contact
+        result = await create_contact(body, db=self.session, current_user=self.user)
+        self.assertEqual(result, contact)
+        stmt = str(self.session.scalar.call_args.args[0])
+        self.assertTrue(stmt.startswith("INSERT INTO contacts"))
+        self.assertIn("RETURNING", stmt)
+        self.session.add.assert_not_called()
+        self.session.refresh.assert_not_awaited()
+        self.session.commit.assert_awaited_once()
 
     async def test_update_contact_found(self):
-        body = ContactResponse(first_name="TestName", last_name="TestSurname", id=1000, email="test@email", phone_number="00000000")
-        contact = Contacts()
-        self.session.query().filter().first.return_value = contact
-        self.session.commit.return_value = None
-        result = await update_contact(contact_id=1000, body=body, db=self.session)
+        body = ContactModel(first_name="TestName", last_name="TestSurname", email="test@email", phone_number=5551234, another_info=None)
+        contact = Contacts(last_name="TestSurname")
+        self.session.scalar.side_effect = ["OldSurname", contact]
+        result = await update_contact(contact_id=1000, body=body, db=self.session, current_user=self.user)
         self.assertEqual(result, contact)
+        self.assertIn("FOR UPDATE", str(self.session.scalar.call_args_list[0].args[0]))
+        stmt = str(self.session.scalar.call_args.args[0])
+        self.assertTrue(stmt.startswith("UPDATE contacts"))
+        self.assertIn("RETURNING", stmt)
+        self.assertEqual(self.session.scalar.await_count, 2)
+        self.assertTrue(str(self.session.execute.call_args.args[0]).startswith("INSERT INTO contact_stats"))
+        self.session.refresh.assert_not_awaited()
+        self.session.commit.assert_awaited_once()
 
     async def test_update_contact_not_found(self):
-        body = ContactResponse(first_name="TestName", last_name="TestSurname", id=1000, email="test@email", phone_number="00000000")
-        self.session.query().filter().first.return_value = None
-        self.session.commit.return_value = None
-        result = await update_contact(contact_id=1000, body=body, db=self.session)
-        self.assertEqual(result)
+        body = ContactModel(first_name="TestName", last_name="TestSurname", email="test@email", phone_number=5551234, another_info=None)
+        self.session.scalar.return_value = None
+        result = await update_contact(contact_id=1000, body=body, db=self.session, current_user=self.user)
+        self.assertIsNone(result)
 
     async def test_delete_contact_found(self):
         contact = Contacts()
-        self.session.query().filter().first.return_value = contact
-        result = await delete_contact(contact_id=1000, db=self.session)
+        self.session.scalar.return_value = contact
+        result = await delete_contact(contact_id=1000, db=self.session, current_user=self.user)
         self.assertEqual(result, contact)
+        self.assertTrue(str(self.session.scalar.call_args.args[0]).startswith("DELETE FROM contacts"))
+        self.session.delete.assert_not_awaited()
 
     async def test_delete_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
-        result = await delete_contact(contact_id=1000, db=self.session)
+        self.session.scalar.return_value = None
+        result = await delete_contact(contact_id=1000, db=self.session, current_user=self.user)
         self.assertIsNone(result)
-
-
-
-
@@ -0,0 +1,27 @@
+import asyncio
+import unittest
+
+from fakeredis import FakeAsyncRedis
+
+from cache import TTLCache, UserCache
+from models import User
+
+
+class TestUserCacheInvalidation(unittest.IsolatedAsyncioTestCase):
+    async def test_invalidation_reaches_other_processes(self):
+        bus = FakeAsyncRedis()
+        api, worker = (UserCache(TTLCache(10, 60), bus=bus) for _ in range(2))
+        listener = asyncio.create_task(api.listen())
+        try:
+            while not (await bus.pubsub_numsub(UserCache.CHANNEL))[0][1]:
+                await asyncio.sleep(0.01)
+            await api.set(User(id=1, email="ann@example.com", avatar="old.png", version=1))
+            await worker.invalidate("ann@example.com")
+            for _ in range(100):
+                if await api.get("ann@example.com") is None:
+                    break
+                await asyncio.sleep(0.01)
+            self.assertIsNone(await api.get("ann@example.com"))
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
@@ -0,0 +1,45 @@
+"""
+Background job worker.
+
+Runs the jobs queued on :data:`jobs.job_queue` (verification emails, avatar uploads). Start one
+or more next to the API; each needs the same settings as the API and access to
+``UPLOAD_STAGING_DIR``. Give every worker a stable ``--id`` so that jobs it was running when it
+crashed are requeued when it restarts.
+
+Usage:
+    python worker.py --concurrency 4 --id worker-1
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from config import settings
+from jobs import job_queue
+from my_email import email_dispatcher
+
+
+async def run(concurrency: int, worker_id: str | None, burst: bool):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    email_dispatcher.start()
+    try:
+        await job_queue.work(concurrency, worker_id, burst=burst, stop=stop)
+    finally:
+        await email_dispatcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=settings.job_concurrency)
+    parser.add_argument("--id", dest="worker_id")
+    parser.add_argument("--burst", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run(args.concurrency, args.worker_id, args.burst))
+
+
+if __name__ == "__main__":
+    main()